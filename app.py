@@ -6,28 +6,66 @@ Uses VLLM for local language model inference
 
 import os
 import json
+import hmac
 import mimetypes
+import random
+import time
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify, send_file, send_from_directory
+from urllib.parse import quote
+from flask import Flask, Response, g, render_template, request, jsonify, send_file, send_from_directory, stream_with_context
 from flask_cors import CORS
 
 # Import local modules
 from config import Config
 from models_handler import ModelHandler
 from library_manager import LibraryManager
+from search_index import LibrarySearchIndex
+from retrieval import LibraryRetriever, fit_passages
+from disk_cache import DiskCache
+from thumbnails import ThumbnailGenerator, ThumbnailError
+from previews import DocumentPreviewer, PreviewError
+from library_archive import stream_folder_zip
+from uploads import UploadManager, UploadError
+from library_changes import LibraryChangeFeed
+from asset_pipeline import AssetPipeline
+from metrics import create_app_metrics
+from tracing import SlowRequestLog, begin_trace, end_trace, trace_phase
+from profiler import Profiler, ProfileError, to_collapsed, to_speedscope
+from traffic import TrafficRecorder
 
 # Initialize Flask app
+# Static files are served by serve_static (fingerprinting and compression),
+# so Flask's built-in static route is disabled
 app = Flask(__name__, 
             template_folder='templates',
-            static_folder='static')
+            static_folder=None)
 CORS(app)
 
 # Load configuration
 config = Config()
 
+# Initialize metrics (aggregated across worker processes when configured)
+metrics = create_app_metrics(config.METRICS_MULTIPROC_DIR, config.METRICS_FLUSH_INTERVAL)
+
+# Per-request phase timing; slow requests are written to a JSON-lines log
+slow_request_log = SlowRequestLog(config.SLOW_REQUEST_LOG_PATH, config.SLOW_REQUEST_THRESHOLD)
+
+# On-demand profiling (idle until an admin starts a profile)
+profiler = Profiler(
+    interval=config.PROFILE_SAMPLE_INTERVAL,
+    max_seconds=config.PROFILE_MAX_SECONDS,
+    max_requests=config.PROFILE_MAX_REQUESTS
+)
+
+# Anonymized traffic recording for load replay (opt-in)
+traffic_recorder = None
+if config.TRAFFIC_RECORD_PATH:
+    traffic_recorder = TrafficRecorder(config.TRAFFIC_RECORD_PATH)
+    print(f"✓ Recording traffic to {config.TRAFFIC_RECORD_PATH}")
+
 # Initialize model handler (loads VLLM model)
 try:
-    model_handler = ModelHandler(config)
+    model_handler = ModelHandler(config, metrics=metrics)
     print(f"✓ Model loaded: {config.MODEL_NAME}")
 except Exception as e:
     print(f"✗ Error loading model: {e}")
@@ -36,11 +74,260 @@ except Exception as e:
 # Initialize library manager
 library_manager = LibraryManager(config.LIBRARY_PATH)
 
+# Track library changes so clients can sync incrementally
+change_feed = LibraryChangeFeed(
+    library_manager,
+    config.LIBRARY_CHANGES_PATH,
+    max_changes=config.LIBRARY_CHANGES_MAX
+)
+if config.BACKGROUND_TASKS_ENABLED:
+    change_feed.start_background_refresh(config.LIBRARY_CHANGES_INTERVAL)
+
+# Initialize library search index (refreshed incrementally in the background)
+search_index = LibrarySearchIndex(
+    config.LIBRARY_PATH,
+    config.SEARCH_INDEX_PATH,
+    workers=config.SEARCH_WORKERS
+)
+if config.BACKGROUND_TASKS_ENABLED:
+    search_index.start_background_refresh(config.SEARCH_REFRESH_INTERVAL)
+
+# Initialize passage retrieval for grounded answers (optional)
+retriever = None
+if config.RAG_ENABLED:
+    try:
+        retriever = LibraryRetriever(
+            config.LIBRARY_PATH,
+            config.RAG_INDEX_PATH,
+            dim=config.RAG_EMBEDDING_DIM,
+            chunk_tokens=config.RAG_CHUNK_TOKENS,
+            chunk_overlap=config.RAG_CHUNK_OVERLAP
+        )
+        if config.BACKGROUND_TASKS_ENABLED:
+            retriever.start_background_refresh(config.RAG_REFRESH_INTERVAL)
+    except ImportError as e:
+        print(f"✗ Retrieval disabled: {e}")
+
+# Initialize thumbnail generation for images and videos
+thumbnail_generator = ThumbnailGenerator(
+    DiskCache(config.THUMBNAIL_CACHE_PATH, config.THUMBNAIL_CACHE_MAX_BYTES),
+    size=config.THUMBNAIL_SIZE,
+    quality=config.THUMBNAIL_QUALITY,
+    workers=config.THUMBNAIL_WORKERS
+)
+
+# Initialize document previews (cache is warmed as new files arrive)
+document_previewer = DocumentPreviewer(
+    config.LIBRARY_PATH,
+    DiskCache(config.PREVIEW_CACHE_PATH, config.PREVIEW_CACHE_MAX_BYTES),
+    workers=config.PREVIEW_WORKERS,
+    max_pages=config.PREVIEW_MAX_PAGES,
+    rows_per_page=config.PREVIEW_ROWS_PER_PAGE,
+    slides_per_page=config.PREVIEW_SLIDES_PER_PAGE,
+    paragraphs_per_page=config.PREVIEW_PARAGRAPHS_PER_PAGE
+)
+if config.BACKGROUND_TASKS_ENABLED:
+    document_previewer.start_background_warmup(config.PREVIEW_WARM_INTERVAL)
+
+
+def on_library_file_added(relative_path):
+    """
+    Bring indexes and caches up to date for a file that was just added
+    
+    Args:
+        relative_path: Path of the file within the library
+    """
+    change_feed.refresh()
+    search_index.update_file(relative_path)
+    if retriever:
+        retriever.update_file(relative_path)
+    
+    full_path = config.LIBRARY_PATH / relative_path
+    if thumbnail_generator.supports(full_path):
+        thumbnail_generator.submit(full_path)
+    if document_previewer.supports(full_path):
+        document_previewer.submit(full_path)
+
+
+# Initialize resumable uploads
+upload_manager = UploadManager(
+    config.LIBRARY_PATH,
+    config.UPLOAD_STAGING_PATH,
+    max_chunk_bytes=config.UPLOAD_MAX_CHUNK_BYTES,
+    session_ttl=config.UPLOAD_SESSION_TTL,
+    completed_ttl=config.UPLOAD_COMPLETED_TTL,
+    on_complete=on_library_file_added
+)
+
+# Build fingerprinted, pre-compressed static assets
+asset_pipeline = AssetPipeline(config.STATIC_PATH)
+if config.ASSET_PIPELINE_ENABLED:
+    try:
+        asset_pipeline.build()
+        print(f"✓ Static assets built: {len(asset_pipeline.manifest)} files")
+    except Exception as e:
+        print(f"✗ Asset pipeline failed, serving source files: {e}")
+
 # Language codes
 SUPPORTED_LANGUAGES = ["en", "ar", "fr"]
 DEFAULT_LANGUAGE = "en"
 
 
+def admin_required():
+    """
+    Check the admin token of the current request
+    
+    Returns:
+        Error response if the request is not authorized, None otherwise
+    """
+    if not config.ADMIN_TOKEN:
+        return jsonify({
+            "success": False,
+            "error": "Admin endpoints are disabled (set HEROTOPIA_ADMIN_TOKEN)"
+        }), 403
+    
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode(), config.ADMIN_TOKEN.encode()):
+        return jsonify({
+            "success": False,
+            "error": "Invalid admin token"
+        }), 401
+    
+    return None
+
+
+def count_library_items(items):
+    """Count files and folders in a library tree"""
+    total = 0
+    for item in items:
+        total += 1 + count_library_items(item.get('children', []))
+    return total
+
+
+@app.before_request
+def start_request_timer():
+    """Remember when the request started, for latency metrics and the slow-request log"""
+    g.request_start = time.perf_counter()
+
+
+@app.before_request
+def begin_request_trace():
+    """Trace a sample of requests phase by phase"""
+    if random.random() < config.REQUEST_TRACE_SAMPLE_RATE:
+        begin_trace()
+
+
+@app.after_request
+def finish_request_trace(response):
+    """Report phase timings in Server-Timing and log slow requests"""
+    trace = end_trace()
+    if trace is not None:
+        response.headers['Server-Timing'] = trace.server_timing()
+    
+    # Timed for every request, so unsampled slow requests are logged too
+    start = g.get('request_start')
+    if start is not None:
+        slow_request_log.record(
+            time.perf_counter() - start,
+            trace,
+            route=request.url_rule.rule if request.url_rule else 'unmatched',
+            method=request.method,
+            status=response.status_code,
+            language=g.get('language', '')
+        )
+    return response
+
+
+@app.teardown_request
+def discard_request_trace(error=None):
+    """Never leak a trace into the next request on this thread"""
+    end_trace()
+
+
+@app.before_request
+def profile_matching_request():
+    """Sample this request's thread if a route profile is armed for it"""
+    if profiler.armed:
+        rule = request.url_rule.rule if request.url_rule else None
+        g.profiled = profiler.request_started(rule, request.path)
+
+
+@app.teardown_request
+def finish_request_profile(error=None):
+    """Hand a profiled request's samples back to the profiler"""
+    if g.pop('profiled', False):
+        profiler.request_finished()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Count the request and record its latency per route and language"""
+    start = g.get('request_start')
+    if start is not None:
+        # Route templates, not raw paths, keep label cardinality bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        language = g.get('language', '')
+        metrics.inc('herotopia_http_requests_total', 1, route, request.method, str(response.status_code), language)
+        metrics.observe('herotopia_http_request_duration_seconds', time.perf_counter() - start, route, language)
+    return response
+
+
+@app.before_request
+def start_traffic_record():
+    """Remember the arrival time of requests when traffic is being recorded"""
+    if traffic_recorder:
+        g.traffic_started = (time.time(), time.perf_counter())
+
+
+@app.after_request
+def record_traffic(response):
+    """Append an anonymized trace of the request (opt-in)"""
+    started = g.pop('traffic_started', None)
+    if started is not None:
+        try:
+            fields = traffic_recorder.describe(
+                request.url_rule.rule if request.url_rule else None,
+                request.path,
+                request.args,
+                request.get_json(silent=True) if request.is_json else None
+            )
+            if fields is not None:
+                traffic_recorder.record(
+                    started[0],
+                    request.method,
+                    response.status_code,
+                    time.perf_counter() - started[1],
+                    fields
+                )
+        except Exception as e:
+            print(f"Error recording traffic: {str(e)}")
+    return response
+
+
+@app.before_request
+def rebuild_stale_assets():
+    """In debug mode, pick up edits to bundled JS/CSS without a restart"""
+    if app.debug and config.ASSET_PIPELINE_ENABLED:
+        try:
+            if asset_pipeline.rebuild_if_stale():
+                print(f"✓ Static assets rebuilt: {len(asset_pipeline.manifest)} files")
+        except Exception as e:
+            print(f"✗ Asset pipeline failed: {e}")
+
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    """Make url_for('serve_static', ...) point at fingerprinted assets"""
+    if endpoint == 'serve_static' and 'filename' in values:
+        values['filename'] = asset_pipeline.resolve(values['filename'])
+
+
+@app.context_processor
+def asset_helpers():
+    """Expose asset bundles to templates"""
+    return {"asset_bundle": asset_pipeline.bundle_sources}
+
+
 @app.route('/')
 def index():
     """
@@ -65,12 +352,14 @@ def chat():
     {
         "response": "generated response",
         "language": "language used",
+        "sources": [library passages used to ground the answer],
         "success": true/false,
         "error": "error message if failed"
     }
     """
     try:
-        data = request.get_json()
+        with trace_phase('parse'):
+            data = request.get_json()
         
         if not data or 'message' not in data:
             return jsonify({
@@ -85,6 +374,7 @@ def chat():
         # Validate language
         if language not in SUPPORTED_LANGUAGES:
             language = DEFAULT_LANGUAGE
+        g.language = language
         
         # Check if message is empty
         if not user_message:
@@ -100,18 +390,37 @@ def chat():
                 "error": "Model not loaded. Please check your setup."
             }), 503
         
-        # Generate response using VLLM
-        response = model_handler.generate_response(
-            message=user_message,
-            language=language,
-            chat_history=chat_history
-        )
+        metrics.inc('herotopia_chat_requests_in_progress')
+        try:
+            # Retrieve relevant library passages within the prompt budget
+            passages = []
+            if retriever:
+                with trace_phase('retrieve'):
+                    passages = fit_passages(
+                        retriever.retrieve(user_message, top_k=config.RAG_TOP_K, min_score=config.RAG_MIN_SCORE),
+                        config.RAG_MAX_CONTEXT_TOKENS
+                    )
+            
+            # Generate response using VLLM
+            response = model_handler.generate_response(
+                message=user_message,
+                language=language,
+                chat_history=chat_history,
+                passages=passages
+            )
+        finally:
+            metrics.dec('herotopia_chat_requests_in_progress')
         
-        return jsonify({
-            "success": True,
-            "response": response,
-            "language": language
-        })
+        with trace_phase('serialize'):
+            return jsonify({
+                "success": True,
+                "response": response,
+                "language": language,
+                "sources": [
+                    {"path": p['path'], "url": p['url'], "score": p['score']}
+                    for p in passages
+                ]
+            })
     
     except Exception as e:
         print(f"Error in /chat: {str(e)}")
@@ -121,6 +430,125 @@ def chat():
         }), 500
 
 
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Batch chat endpoint - answers many independent messages in one request
+    using batched generation; results are streamed as they finish
+    
+    Expected JSON payload:
+    {
+        "items": [
+            {"id": "optional client id", "message": "...", "language": "en|ar|fr", "history": [...]}
+        ]
+    }
+    
+    Returns (application/x-ndjson, one JSON object per line):
+        {"index": 0, "id": ..., "success": true, "response": "...", "language": "en", "sources": [...]}
+        {"index": 1, "id": ..., "success": false, "error": "..."}
+        {"done": true, "count": 2, "failed": 1}
+    """
+    try:
+        data = request.get_json(silent=True)
+        items = data.get('items') if isinstance(data, dict) else None
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                "success": False,
+                "error": "Missing 'items' in request"
+            }), 400
+        
+        if len(items) > config.BATCH_MAX_ITEMS:
+            return jsonify({
+                "success": False,
+                "error": f"At most {config.BATCH_MAX_ITEMS} items per batch"
+            }), 413
+        
+        if not model_handler:
+            return jsonify({
+                "success": False,
+                "error": "Model not loaded. Please check your setup."
+            }), 503
+        
+        # Validate each item on its own so one bad item never fails the batch
+        results = {}
+        prepared = []
+        for index, item in enumerate(items):
+            item = item if isinstance(item, dict) else {}
+            message = str(item.get('message') or '').strip()
+            language = item.get('language', DEFAULT_LANGUAGE)
+            if language not in SUPPORTED_LANGUAGES:
+                language = DEFAULT_LANGUAGE
+            history = item.get('history') if isinstance(item.get('history'), list) else []
+            
+            results[index] = {"index": index, "id": item.get('id'), "language": language}
+            if not message:
+                results[index].update({"success": False, "error": "Message cannot be empty"})
+                continue
+            
+            passages = []
+            if retriever:
+                passages = fit_passages(
+                    retriever.retrieve(message, top_k=config.RAG_TOP_K, min_score=config.RAG_MIN_SCORE),
+                    config.RAG_MAX_CONTEXT_TOKENS
+                )
+            
+            results[index]["sources"] = [
+                {"path": p['path'], "url": p['url'], "score": p['score']}
+                for p in passages
+            ]
+            prepared.append((index, {
+                "message": message,
+                "language": language,
+                "history": history,
+                "passages": passages
+            }))
+        
+        def stream():
+            failed = 0
+            
+            for index, result in results.items():
+                if result.get('success') is False:
+                    failed += 1
+                    yield json.dumps(result, ensure_ascii=False) + '\n'
+            
+            if prepared:
+                try:
+                    for outcome in model_handler.batch_generate([item for _, item in prepared], config.BATCH_MAX_SIZE):
+                        result = results[prepared[outcome['index']][0]]
+                        if 'error' in outcome:
+                            failed += 1
+                            result.update({"success": False, "error": outcome['error']})
+                            result.pop('sources', None)
+                        else:
+                            result.update({"success": True, "response": outcome['response']})
+                        yield json.dumps(result, ensure_ascii=False) + '\n'
+                except Exception as e:
+                    # Items not answered yet are reported individually
+                    print(f"Error in /chat/batch: {str(e)}")
+                    for result in results.values():
+                        if 'success' not in result:
+                            failed += 1
+                            result.pop('sources', None)
+                            result.update({"success": False, "error": f"Server error: {str(e)}"})
+                            yield json.dumps(result, ensure_ascii=False) + '\n'
+            
+            yield json.dumps({"done": True, "count": len(results), "failed": failed}) + '\n'
+        
+        return Response(
+            stream_with_context(stream()),
+            mimetype='application/x-ndjson',
+            headers={"Cache-Control": "no-store"}
+        )
+    
+    except Exception as e:
+        print(f"Error in /chat/batch: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Server error: {str(e)}"
+        }), 500
+
+
 @app.route('/library')
 def library():
     """
@@ -130,17 +558,394 @@ def library():
     {
         "success": true/false,
         "items": [list of library items with metadata],
+        "version": library version the items are at least as new as,
+        "epoch": server epoch the version belongs to,
+        "error": "error message if failed"
+    }
+    """
+    try:
+        # Read the version before scanning so no later change can be missed
+        version = change_feed.version
+        
+        with trace_phase('scan'):
+            start = time.perf_counter()
+            items = library_manager.get_library_structure()
+            metrics.observe('herotopia_library_scan_duration_seconds', time.perf_counter() - start)
+        metrics.set('herotopia_library_items', count_library_items(items))
+        
+        with trace_phase('serialize'):
+            return jsonify({
+                "success": True,
+                "items": items,
+                "version": version,
+                "epoch": change_feed.epoch
+            })
+    except Exception as e:
+        print(f"Error in /library: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Server error: {str(e)}"
+        }), 500
+
+
+@app.route('/library/changes')
+def library_changes():
+    """
+    Library change feed - returns only what changed since a version
+    
+    Query parameters:
+        since: last library version the client applied
+        epoch: epoch returned together with that version
+    
+    Returns:
+    {
+        "success": true/false,
+        "version": current library version,
+        "epoch": current server epoch,
+        "reset": true if the client must reload the full tree,
+        "changes": [{"version", "op": "added|removed|modified", "path", "item"}],
         "error": "error message if failed"
     }
     """
     try:
-        items = library_manager.get_library_structure()
+        since = request.args.get('since', -1, type=int)
+        epoch = request.args.get('epoch')
+        
+        version, changes = change_feed.changes_since(since, epoch)
+        
         return jsonify({
             "success": True,
-            "items": items
+            "version": version,
+            "epoch": change_feed.epoch,
+            "reset": changes is None,
+            "changes": changes or []
         })
+    
     except Exception as e:
-        print(f"Error in /library: {str(e)}")
+        print(f"Error in /library/changes: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Server error: {str(e)}"
+        }), 500
+
+
+@app.route('/library/search')
+def search_library():
+    """
+    Library search endpoint - full-text search over names, folders and content
+    
+    Query parameters:
+        q: search string (the last word matches as a prefix)
+        limit: maximum number of results
+    
+    Returns:
+    {
+        "success": true/false,
+        "query": "search string",
+        "results": [list of matches ordered by relevance],
+        "error": "error message if failed"
+    }
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        limit = request.args.get('limit', config.SEARCH_MAX_RESULTS, type=int)
+        limit = max(1, min(limit, config.SEARCH_MAX_RESULTS))
+        
+        if not query:
+            return jsonify({
+                "success": False,
+                "error": "Missing 'q' in request"
+            }), 400
+        
+        return jsonify({
+            "success": True,
+            "query": query,
+            "results": search_index.search(query, limit=limit)
+        })
+    
+    except Exception as e:
+        print(f"Error in /library/search: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Server error: {str(e)}"
+        }), 500
+
+
+@app.route('/library/thumb/<path:filepath>')
+def serve_library_thumbnail(filepath):
+    """
+    Serve a downscaled thumbnail (or video poster frame) of a library file
+    
+    Args:
+        filepath: Path to the file within the library folder
+    
+    Returns:
+        A small JPEG, cached by the browser for a long time.
+        Requests with a ?v=<modified> query are marked immutable.
+        422 if the file's content cannot be turned into a thumbnail.
+    """
+    try:
+        safe_path = library_manager.get_safe_path(filepath)
+        
+        if not safe_path or not safe_path.is_file():
+            return jsonify({
+                "success": False,
+                "error": "File not found"
+            }), 404
+        
+        if not thumbnail_generator.supports(safe_path):
+            return jsonify({
+                "success": False,
+                "error": "No thumbnail available for this file type"
+            }), 404
+        
+        try:
+            thumb_path = thumbnail_generator.get(safe_path, timeout=config.THUMBNAIL_WAIT_SECONDS)
+        except ThumbnailError:
+            # Damaged or unsupported content; the failure is cached until the file changes
+            return jsonify({
+                "success": False,
+                "error": "Could not generate a thumbnail for this file"
+            }), 422
+        
+        if not thumb_path:
+            return jsonify({
+                "success": False,
+                "error": "Thumbnail is not ready yet"
+            }), 503
+        
+        response = send_file(thumb_path, mimetype='image/jpeg', max_age=config.THUMBNAIL_MAX_AGE)
+        if request.args.get('v'):
+            response.headers['Cache-Control'] = f"public, max-age={config.THUMBNAIL_MAX_AGE}, immutable"
+        return response
+    
+    except Exception as e:
+        print(f"Error serving thumbnail: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Server error: {str(e)}"
+        }), 500
+
+
+@app.route('/library/preview/<path:filepath>')
+def preview_library_file(filepath):
+    """
+    Lightweight HTML preview of a DOCX, PPTX, XLSX or CSV library file
+    
+    Args:
+        filepath: Path to the file within the library folder
+    
+    Query parameters:
+        page: preview page number (starting at 1)
+    
+    Returns:
+    {
+        "success": true/false,
+        "html": "HTML of the requested page",
+        "page": current page,
+        "pages": total number of pages,
+        "truncated": true if the document was longer than the preview,
+        "error": "error message if failed"
+    }
+    """
+    try:
+        safe_path = library_manager.get_safe_path(filepath)
+        
+        if not safe_path or not safe_path.is_file():
+            return jsonify({
+                "success": False,
+                "error": "File not found"
+            }), 404
+        
+        if not document_previewer.supports(safe_path):
+            return jsonify({
+                "success": False,
+                "error": "No preview available for this file type"
+            }), 404
+        
+        try:
+            preview = document_previewer.get(safe_path, timeout=config.PREVIEW_WAIT_SECONDS)
+        except PreviewError:
+            # Damaged or unsupported content; the failure is cached until the file changes
+            return jsonify({
+                "success": False,
+                "error": "This document could not be converted for preview"
+            }), 422
+        
+        if preview is None:
+            return jsonify({
+                "success": False,
+                "error": "Preview is not ready yet"
+            }), 503
+        
+        pages = preview['pages']
+        page = request.args.get('page', 1, type=int)
+        page = max(1, min(page, len(pages) or 1))
+        
+        return jsonify({
+            "success": True,
+            "html": pages[page - 1] if pages else "",
+            "page": page,
+            "pages": len(pages),
+            "truncated": preview['truncated']
+        })
+    
+    except Exception as e:
+        print(f"Error building preview: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Server error: {str(e)}"
+        }), 500
+
+
+@app.route('/library/archive/<path:folderpath>')
+def download_library_folder(folderpath):
+    """
+    Download a library folder as a ZIP archive
+    The archive is generated while it is sent, so memory use stays constant
+    
+    Args:
+        folderpath: Path to the folder within the library
+    
+    Returns:
+        Streaming ZIP download
+    """
+    try:
+        safe_path = library_manager.get_safe_path(folderpath)
+        
+        if not safe_path or not safe_path.is_dir():
+            return jsonify({
+                "success": False,
+                "error": "Folder not found"
+            }), 404
+        
+        archive_name = f"{safe_path.name}.zip"
+        stream = stream_folder_zip(
+            safe_path,
+            config.LIBRARY_PATH.resolve(),
+            chunk_size=config.ARCHIVE_CHUNK_SIZE
+        )
+        
+        return Response(
+            stream_with_context(stream),
+            mimetype='application/zip',
+            headers={
+                "Content-Disposition": f"attachment; filename*=UTF-8''{quote(archive_name)}",
+                "Cache-Control": "no-store"
+            }
+        )
+    
+    except Exception as e:
+        print(f"Error creating archive: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Server error: {str(e)}"
+        }), 500
+
+
+@app.route('/library/uploads', methods=['POST'])
+def create_upload():
+    """
+    Start a resumable upload (staff only, requires X-Admin-Token)
+    
+    Expected JSON payload:
+    {
+        "path": "Folder/file.mp4",
+        "size": total size in bytes,
+        "sha256": "hex digest of the whole file (optional)",
+        "overwrite": false
+    }
+    
+    Returns:
+    {
+        "success": true/false,
+        "upload_id": "session id",
+        "offset": bytes received so far,
+        ...
+    }
+    """
+    denied = admin_required()
+    if denied:
+        return denied
+    
+    try:
+        data = request.get_json(silent=True)
+        
+        if not data or 'path' not in data or 'size' not in data:
+            return jsonify({
+                "success": False,
+                "error": "Missing 'path' or 'size' in request"
+            }), 400
+        
+        status = upload_manager.create(
+            data['path'],
+            data['size'],
+            sha256=data.get('sha256'),
+            overwrite=bool(data.get('overwrite', False))
+        )
+        return jsonify({"success": True, **status}), 201
+    
+    except UploadError as e:
+        return jsonify({"success": False, "error": str(e), **e.details}), e.status
+    except Exception as e:
+        print(f"Error in /library/uploads: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Server error: {str(e)}"
+        }), 500
+
+
+@app.route('/library/uploads/<upload_id>', methods=['GET', 'PATCH', 'DELETE'])
+def upload_chunk(upload_id):
+    """
+    Resumable upload session (staff only, requires X-Admin-Token)
+    
+    GET: current offset, to resume after a failure
+    PATCH: append a chunk; raw bytes in the body, with headers
+        Upload-Offset: byte offset of the chunk
+        X-Chunk-SHA256: hex digest of the chunk (optional)
+    DELETE: cancel the upload
+    
+    Returns:
+    {
+        "success": true/false,
+        "offset": bytes received so far,
+        "complete": true once the file is in the library,
+        "error": "error message if failed"
+    }
+    """
+    denied = admin_required()
+    if denied:
+        return denied
+    
+    try:
+        if request.method == 'GET':
+            return jsonify({"success": True, **upload_manager.status(upload_id)})
+        
+        if request.method == 'DELETE':
+            upload_manager.abort(upload_id)
+            return jsonify({"success": True})
+        
+        offset = request.headers.get('Upload-Offset', type=int)
+        if offset is None:
+            return jsonify({
+                "success": False,
+                "error": "Missing 'Upload-Offset' header"
+            }), 400
+        
+        status = upload_manager.write_chunk(
+            upload_id,
+            offset,
+            request.stream,
+            request.content_length or 0,
+            chunk_sha256=request.headers.get('X-Chunk-SHA256')
+        )
+        return jsonify({"success": True, **status})
+    
+    except UploadError as e:
+        return jsonify({"success": False, "error": str(e), **e.details}), e.status
+    except Exception as e:
+        print(f"Error in /library/uploads: {str(e)}")
         return jsonify({
             "success": False,
             "error": f"Server error: {str(e)}"
@@ -160,9 +965,11 @@ def serve_library_file(filepath):
     """
     try:
         # Sanitize and validate filepath
-        safe_path = library_manager.get_safe_path(filepath)
+        with trace_phase('resolve'):
+            safe_path = library_manager.get_safe_path(filepath)
+            found = bool(safe_path) and safe_path.exists()
         
-        if not safe_path or not safe_path.exists():
+        if not found:
             return jsonify({
                 "success": False,
                 "error": "File not found"
@@ -175,11 +982,15 @@ def serve_library_file(filepath):
             }), 400
         
         # Serve the file
-        return send_file(
-            safe_path,
-            as_attachment=False,
-            mimetype=mimetypes.guess_type(str(safe_path))[0]
-        )
+        with trace_phase('send'):
+            response = send_file(
+                safe_path,
+                as_attachment=False,
+                mimetype=mimetypes.guess_type(str(safe_path))[0]
+            )
+        # Content-Length reflects ranges and 304s, i.e. what is actually sent
+        metrics.inc('herotopia_library_bytes_served_total', response.content_length or 0)
+        return response
     
     except Exception as e:
         print(f"Error serving file: {str(e)}")
@@ -191,8 +1002,123 @@ def serve_library_file(filepath):
 
 @app.route('/static/<path:filename>')
 def serve_static(filename):
-    """Serve static files (CSS, JS, Bootstrap library)"""
-    return send_from_directory(app.static_folder, filename)
+    """
+    Serve static files (CSS, JS, Bootstrap library)
+    Fingerprinted assets are cached forever and sent pre-compressed
+    when the browser accepts brotli or gzip
+    """
+    if not asset_pipeline.is_fingerprinted(filename):
+        return send_from_directory(config.STATIC_PATH, filename)
+    
+    accepted = [coding for coding, quality in request.accept_encodings if quality > 0]
+    variant = asset_pipeline.compressed_variant(filename, accepted)
+    mimetype = mimetypes.guess_type(filename)[0]
+    
+    if variant:
+        response = send_from_directory(config.STATIC_PATH, variant[0], mimetype=mimetype)
+        response.headers['Content-Encoding'] = variant[1]
+        response.headers.pop('Content-Disposition', None)
+    else:
+        response = send_from_directory(config.STATIC_PATH, filename, mimetype=mimetype)
+    
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def profile_response(samples, interval, name):
+    """Render profile samples in the format requested by ?format="""
+    if request.args.get('format', 'collapsed') == 'speedscope':
+        return jsonify(to_speedscope(samples, interval, name))
+    return Response(to_collapsed(samples), mimetype='text/plain; charset=utf-8')
+
+
+@app.route('/admin/profile', methods=['POST'])
+def profile_process():
+    """
+    Sample the stacks of all threads for a number of seconds (staff only)
+    
+    Query parameters:
+        seconds: profile duration
+        format: collapsed (default) or speedscope
+    
+    Returns:
+        Collapsed stacks as text, or a speedscope JSON file
+    """
+    denied = admin_required()
+    if denied:
+        return denied
+    
+    try:
+        seconds = request.args.get('seconds', 10, type=float)
+        samples = profiler.profile_for(seconds)
+        return profile_response(samples, profiler.interval, f"herotopia {seconds:g}s")
+    
+    except ProfileError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+    except Exception as e:
+        print(f"Error in /admin/profile: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Server error: {str(e)}"
+        }), 500
+
+
+@app.route('/admin/profile/requests', methods=['GET', 'POST', 'DELETE'])
+def profile_requests():
+    """
+    Profile the next N requests to a route (staff only)
+    
+    POST: start; JSON payload {"route": "/library", "count": 20}
+        route is a rule such as '/library/<path:filepath>' or an exact path
+    GET: status, or the profile once every request is done
+        (format: collapsed (default) or speedscope)
+    DELETE: cancel the profile
+    
+    Returns:
+        Profile status, or the profile itself when it is ready
+    """
+    denied = admin_required()
+    if denied:
+        return denied
+    
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            count = data.get('count', 10)
+            if not isinstance(count, int):
+                return jsonify({
+                    "success": False,
+                    "error": "'count' must be an integer"
+                }), 400
+            status = profiler.arm(data.get('route'), count)
+            return jsonify({"success": True, **status}), 202
+        
+        if request.method == 'DELETE':
+            profiler.disarm()
+            return jsonify({"success": True})
+        
+        status, samples = profiler.result()
+        if samples is None:
+            return jsonify({"success": True, **status}), 202 if status['running'] else 404
+        return profile_response(samples, profiler.interval, f"herotopia {status['route']} x{status['requested']}")
+    
+    except ProfileError as e:
+        return jsonify({"success": False, "error": str(e)}), e.status
+    except Exception as e:
+        print(f"Error in /admin/profile/requests: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Server error: {str(e)}"
+        }), 500
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """
+    Prometheus metrics endpoint (text exposition format)
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 
 @app.errorhandler(404)
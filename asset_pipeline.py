@@ -0,0 +1,261 @@
+"""
+Asset Pipeline Module
+Bundles, minifies and fingerprints static assets and writes pre-compressed
+variants so they can be cached by browsers forever
+Run directly to build ahead of time: python asset_pipeline.py
+"""
+
+import gzip
+import hashlib
+import json
+import re
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:
+    # Brotli variants are optional; gzip is always written
+    brotli = None
+
+
+# Files concatenated into each bundle, in load order
+BUNDLES = {
+    'js/app.js': ['js/utils.js', 'js/chat.js', 'js/library.js', 'js/main.js'],
+    'css/app.css': ['css/style.css'],
+}
+
+# Files fingerprinted as they are (already minified vendor assets)
+PASSTHROUGH = [
+    'lib/bootstrap-5.3.0/css/bootstrap.min.css',
+    'lib/bootstrap-5.3.0/js/bootstrap.bundle.min.js',
+]
+
+# Smaller files are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+
+def minify_js(source: str) -> str:
+    """
+    Conservatively minify JavaScript
+    Removes comment-only lines, indentation and blank lines but keeps line
+    breaks, so automatic semicolon insertion and string contents are safe
+
+    Args:
+        source: JavaScript source
+
+    Returns:
+        Minified source
+    """
+    lines = []
+    in_block_comment = False
+
+    for line in source.splitlines():
+        stripped = line.strip()
+
+        if in_block_comment:
+            if '*/' in stripped:
+                in_block_comment = False
+            continue
+
+        if stripped.startswith('/*'):
+            if '*/' not in stripped:
+                in_block_comment = True
+                continue
+            if stripped.endswith('*/'):
+                continue
+        elif stripped.startswith('//') or not stripped:
+            continue
+
+        lines.append(stripped)
+
+    return '\n'.join(lines) + '\n'
+
+
+def minify_css(source: str) -> str:
+    """
+    Minify CSS by removing comments and collapsing whitespace
+
+    Args:
+        source: CSS source
+
+    Returns:
+        Minified source
+    """
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    return source.replace(';}', '}').strip() + '\n'
+
+
+MINIFIERS = {
+    '.js': minify_js,
+    '.css': minify_css,
+}
+
+
+class AssetPipeline:
+    """
+    Builds fingerprinted assets into static/dist and keeps a manifest
+    mapping logical names (e.g. 'js/app.js') to built files
+    """
+
+    def __init__(self, static_dir: Path, output_subdir: str = 'dist'):
+        """
+        Initialize the pipeline
+
+        Args:
+            static_dir: Flask static folder
+            output_subdir: Folder inside static_dir for built assets
+        """
+        self.static_dir = Path(static_dir)
+        self.output_subdir = output_subdir
+        self.output_dir = self.static_dir / output_subdir
+        self.manifest: Dict[str, str] = {}
+        self._build_lock = threading.Lock()
+
+    def build(self) -> Dict[str, str]:
+        """
+        Build all bundles and passthrough assets
+
+        Returns:
+            Manifest of logical name -> fingerprinted path (relative to static_dir)
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        manifest = {}
+
+        for name, sources in BUNDLES.items():
+            paths = [self.static_dir / source for source in sources]
+            if not all(path.exists() for path in paths):
+                continue
+
+            content = '\n'.join(path.read_text(encoding='utf-8') for path in paths)
+            minify = MINIFIERS.get(Path(name).suffix)
+            if minify:
+                content = minify(content)
+
+            manifest[name] = self._write(name, content.encode('utf-8'))
+
+        for name in PASSTHROUGH:
+            path = self.static_dir / name
+            if path.exists():
+                manifest[name] = self._write(name, path.read_bytes())
+
+        self._remove_stale(manifest)
+        (self.output_dir / 'manifest.json').write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+
+        self.manifest = manifest
+        return manifest
+
+    def is_stale(self) -> bool:
+        """Check whether a source file changed after the last build"""
+        manifest_path = self.output_dir / 'manifest.json'
+        if not manifest_path.exists():
+            return True
+        built_at = manifest_path.stat().st_mtime
+
+        sources = [source for bundle in BUNDLES.values() for source in bundle] + PASSTHROUGH
+        for source in sources:
+            path = self.static_dir / source
+            if path.exists() and path.stat().st_mtime > built_at:
+                return True
+        return False
+
+    def rebuild_if_stale(self) -> bool:
+        """
+        Rebuild when a source file is newer than the manifest (for development)
+
+        Returns:
+            True if the assets were rebuilt
+        """
+        with self._build_lock:
+            if not self.is_stale():
+                return False
+            self.build()
+            return True
+
+    def _write(self, name: str, data: bytes) -> str:
+        """Write one fingerprinted asset plus its compressed variants"""
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        logical = Path(name)
+        filename = f"{logical.stem}.{digest}{logical.suffix}"
+        target = self.output_dir / filename
+
+        if not target.exists():
+            target.write_bytes(data)
+
+            if len(data) >= MIN_COMPRESS_BYTES:
+                target.with_name(filename + '.gz').write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    target.with_name(filename + '.br').write_bytes(brotli.compress(data, quality=11))
+
+        return f"{self.output_subdir}/{filename}"
+
+    def _remove_stale(self, manifest: Dict[str, str]):
+        """Delete built files that are no longer in the manifest"""
+        current = {Path(path).name for path in manifest.values()}
+        for entry in self.output_dir.iterdir():
+            if entry.name == 'manifest.json':
+                continue
+            base_name = re.sub(r'\.(gz|br)$', '', entry.name)
+            if base_name not in current:
+                if entry.is_dir():
+                    shutil.rmtree(entry)
+                else:
+                    entry.unlink()
+
+    def resolve(self, name: str) -> str:
+        """
+        Get the built path for a logical asset name
+
+        Args:
+            name: Logical name relative to the static folder
+
+        Returns:
+            Fingerprinted path if built, otherwise the name unchanged
+        """
+        return self.manifest.get(name, name)
+
+    def bundle_sources(self, name: str) -> List[str]:
+        """
+        Get the files a template should load for a bundle
+
+        Args:
+            name: Bundle name (e.g. 'js/app.js')
+
+        Returns:
+            The built bundle if available, otherwise its individual source files
+        """
+        if name in self.manifest:
+            return [name]
+        return BUNDLES.get(name, [name])
+
+    def is_fingerprinted(self, filename: str) -> bool:
+        """Check whether a requested static path is a built, fingerprinted asset"""
+        return filename.startswith(f"{self.output_subdir}/") and filename in self.manifest.values()
+
+    def compressed_variant(self, filename: str, accepted: List[str]) -> Optional[tuple]:
+        """
+        Pick the best pre-compressed variant the client accepts
+
+        Args:
+            filename: Built asset path relative to the static folder
+            accepted: Content codings the client accepts
+
+        Returns:
+            Tuple of (variant path relative to static_dir, coding), or None
+        """
+        for coding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if coding in accepted and (self.static_dir / (filename + suffix)).exists():
+                return filename + suffix, coding
+        return None
+
+
+if __name__ == '__main__':
+    from config import Config
+
+    built = AssetPipeline(Config.STATIC_PATH).build()
+    for logical_name, built_path in built.items():
+        print(f"  ✓ {logical_name} -> {built_path}")
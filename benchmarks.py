@@ -0,0 +1,428 @@
+"""
+Benchmark Suite
+Reproducible CPU-only benchmarks of prompt building, library scanning,
+path resolution, /library serialization and end-to-end /chat throughput
+
+The model is always replaced by a fake constant-latency backend, so no GPU
+(or VLLM install) is needed and /chat numbers measure the server, not the model.
+
+Usage:
+    python benchmarks.py                      # run, write results, compare with the baseline
+    python benchmarks.py --save-baseline      # run and store the results as the new baseline
+    python benchmarks.py --scales 1000,1000000 --only library
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import types
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List
+
+
+DEFAULT_SCALES = (1000, 10000, 100000)
+FILES_PER_FOLDER = 100
+FOLDERS_PER_FOLDER = 10
+EXTENSIONS = ('pdf', 'txt', 'mp4', 'png', 'docx', 'csv')
+
+
+# ----------------------------------------------------------------------
+# Fake model backend
+# ----------------------------------------------------------------------
+
+class FakeSamplingParams:
+    """Accepts the same arguments as vllm.SamplingParams"""
+
+    def __init__(self, **kwargs):
+        self.max_tokens = kwargs.get('max_tokens', 64)
+
+
+class FakeLLM:
+    """
+    Stands in for vllm.LLM: every generate() call sleeps a constant time
+    and returns a fixed completion
+    """
+
+    latency = 0.02
+    completion_tokens = 64
+
+    def __init__(self, **kwargs):
+        pass
+
+    def generate(self, prompts, sampling_params=None):
+        time.sleep(self.latency)
+        if isinstance(prompts, str):
+            prompts = [prompts]
+        return [
+            types.SimpleNamespace(
+                prompt_token_ids=[0] * (len(prompt) // 4),
+                outputs=[types.SimpleNamespace(
+                    text=" benchmark answer",
+                    token_ids=[0] * self.completion_tokens
+                )]
+            )
+            for prompt in prompts
+        ]
+
+
+def install_fake_backend(latency: float):
+    """
+    Make models_handler use FakeLLM, even where VLLM is installed
+    Must run before models_handler (or app) is imported
+    """
+    FakeLLM.latency = latency
+    module = types.ModuleType('vllm')
+    module.LLM = FakeLLM
+    module.SamplingParams = FakeSamplingParams
+    sys.modules['vllm'] = module
+
+    # models_handler imports torch but does not need it for inference
+    try:
+        import torch  # noqa: F401
+    except ImportError:
+        sys.modules['torch'] = types.ModuleType('torch')
+
+
+# ----------------------------------------------------------------------
+# Helpers
+# ----------------------------------------------------------------------
+
+def per_call(func: Callable, repeat: int = 5) -> float:
+    """
+    Time a function like timeit: calibrated loop, best of several repeats
+
+    Returns:
+        Seconds per call
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def build_tree(root: Path, files: int) -> Path:
+    """
+    Create (or reuse) a synthetic library with `files` empty files,
+    FILES_PER_FOLDER per folder, FOLDERS_PER_FOLDER subfolders per level
+
+    Returns:
+        Path of the library root
+    """
+    library = root / f"library-{files}"
+    marker = library / '.complete'
+    if marker.exists():
+        return library
+
+    shutil.rmtree(library, ignore_errors=True)
+    folders = max(1, files // FILES_PER_FOLDER)
+    created = 0
+
+    for index in range(folders):
+        # Spread folders over a nested hierarchy: a/b/c...
+        parts, value = [], index
+        while True:
+            parts.append(f"folder{value % FOLDERS_PER_FOLDER}")
+            value //= FOLDERS_PER_FOLDER
+            if value == 0:
+                break
+        folder = library.joinpath(*reversed(parts), f"set{index}")
+        folder.mkdir(parents=True, exist_ok=True)
+
+        for number in range(min(FILES_PER_FOLDER, files - created)):
+            (folder / f"lesson{number}.{EXTENSIONS[number % len(EXTENSIONS)]}").touch()
+        created += FILES_PER_FOLDER
+
+    marker.touch()
+    return library
+
+
+def sample_paths(library: Path, count: int) -> List[str]:
+    """Pick existing file paths relative to the library"""
+    paths = []
+    for path in library.rglob('*'):
+        if path.is_file() and not path.name.startswith('.'):
+            paths.append(path.relative_to(library).as_posix())
+            if len(paths) >= count:
+                break
+    return paths
+
+
+# ----------------------------------------------------------------------
+# Benchmarks
+# ----------------------------------------------------------------------
+
+def bench_format_prompt(results: Dict, args):
+    """_format_prompt across history lengths and languages"""
+    from config import Config
+    from models_handler import ModelHandler
+
+    handler = ModelHandler(Config())
+    passages = [
+        {'url': f"/library/Science/doc{i}.pdf", 'text': "Photosynthesis converts light energy into chemical energy. " * 8}
+        for i in range(3)
+    ]
+
+    # Only the last MAX_HISTORY_CONTEXT messages reach the prompt; longer histories measure the same thing
+    max_history = handler.config.MAX_HISTORY_CONTEXT
+    history_lengths = sorted({0, 1, max_history // 2, max_history})
+
+    for language in ('en', 'ar', 'fr'):
+        for history_length in history_lengths:
+            history = [
+                {'role': 'user' if i % 2 == 0 else 'assistant', 'content': f"Message number {i} about the lesson. " * 4}
+                for i in range(history_length)
+            ]
+            seconds = per_call(lambda: handler._format_prompt("What is photosynthesis?", language, history, passages))
+            record(results, f"format_prompt.{language}.history_{history_length}", seconds * 1e6, 'us/op')
+
+
+def bench_library(results: Dict, args):
+    """get_library_structure, get_safe_path and /library serialization on synthetic trees"""
+    from flask import Flask, jsonify
+    from library_manager import LibraryManager
+
+    flask_app = Flask(__name__)
+
+    for files in args.scales:
+        library = build_tree(args.tree_dir, files)
+        manager = LibraryManager(library)
+
+        # Large trees take seconds per scan; a few single runs are enough
+        repeat = 3 if files >= 100000 else 5
+        timer = timeit.Timer(manager.get_library_structure)
+        number = 1 if files >= 100000 else timer.autorange()[0]
+        seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+        record(results, f"library_structure.files_{files}", seconds * 1000, 'ms/op')
+
+        items = manager.get_library_structure()
+        with flask_app.app_context():
+            seconds = min(timeit.repeat(
+                lambda: jsonify({"success": True, "items": items, "version": 0, "epoch": ""}).get_data(),
+                repeat=repeat, number=1
+            ))
+        record(results, f"library_json.files_{files}", seconds * 1000, 'ms/op')
+
+    # Path resolution does not depend much on tree size; use the smallest tree
+    library = build_tree(args.tree_dir, min(args.scales))
+    manager = LibraryManager(library)
+    existing = sample_paths(library, 200)
+    cases = {
+        'existing': existing,
+        'missing': [path + '.missing' for path in existing],
+        'traversal': ['../' * (i % 5 + 1) + 'etc/passwd' for i in range(len(existing))],
+    }
+    for name, paths in cases.items():
+        seconds = per_call(lambda: [manager.get_safe_path(path) for path in paths]) / len(paths)
+        record(results, f"safe_path.{name}", seconds * 1e6, 'us/op')
+
+
+def isolate_app(root: Path):
+    """
+    Point the app's library, caches and logs at a synthetic library under
+    `root` and turn off background threads and optional features, so /chat
+    numbers do not depend on the local library, indexes or indexing work
+    Must run before app is imported
+    """
+    from config import Config
+
+    library = root / 'library'
+    folder = library / 'Science'
+    folder.mkdir(parents=True, exist_ok=True)
+    for number in range(10):
+        (folder / f"lesson{number}.txt").write_text(
+            "The water cycle moves water between the sea, the air and the land. " * 20, encoding='utf-8'
+        )
+
+    cache = root / 'cache'
+    Config.LIBRARY_PATH = library
+    Config.CACHE_PATH = cache
+    Config.SEARCH_INDEX_PATH = cache / 'search_index.sqlite3'
+    Config.RAG_INDEX_PATH = cache / 'retrieval'
+    Config.THUMBNAIL_CACHE_PATH = cache / 'thumbnails'
+    Config.PREVIEW_CACHE_PATH = cache / 'previews'
+    Config.LIBRARY_CHANGES_PATH = cache / 'library_changes.sqlite3'
+    Config.UPLOAD_STAGING_PATH = root / 'upload_staging'
+    Config.SLOW_REQUEST_LOG_PATH = root / 'logs' / 'slow_requests.jsonl'
+
+    Config.BACKGROUND_TASKS_ENABLED = False
+    Config.RAG_ENABLED = False
+    Config.ASSET_PIPELINE_ENABLED = False
+    Config.TRAFFIC_RECORD_PATH = None
+    Config.METRICS_MULTIPROC_DIR = None
+
+
+def bench_chat(results: Dict, args):
+    """End-to-end /chat throughput against the fake backend and a synthetic library"""
+    if 'app' in sys.modules:
+        print("  ! /chat skipped: app was imported before it could be isolated")
+        return
+
+    root = Path(tempfile.mkdtemp(prefix='herotopia-bench-chat-'))
+    try:
+        isolate_app(root)
+        import app as app_module
+
+        if app_module.model_handler is None:
+            print("  ! /chat skipped: model handler failed to initialize")
+            return
+
+        run_chat(app_module.app, results, args)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def run_chat(flask_app, results: Dict, args):
+    """Measure /chat overhead, throughput and latency with test clients"""
+
+    payload = {
+        'message': "Explain the water cycle in simple words.",
+        'language': 'en',
+        'history': [
+            {'role': 'user' if i % 2 == 0 else 'assistant', 'content': "Earlier message. " * 10}
+            for i in range(10)
+        ]
+    }
+    local = threading.local()
+
+    def send():
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = flask_app.test_client()
+        start = time.perf_counter()
+        response = client.post('/chat', json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"/chat returned {response.status_code}")
+        return time.perf_counter() - start
+
+    # Server overhead per request: one request at a time, minus the model's latency
+    latencies = [send() for _ in range(max(10, args.requests // 10))]
+    record(results, 'chat.overhead', (statistics.median(latencies) - FakeLLM.latency) * 1000, 'ms/op')
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        start = time.perf_counter()
+        latencies = list(pool.map(lambda _: send(), range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    record(results, 'chat.throughput', args.requests / elapsed, 'req/s', higher_is_better=True)
+    record(results, 'chat.latency_p50', percentile(latencies, 0.50) * 1000, 'ms')
+    record(results, 'chat.latency_p95', percentile(latencies, 0.95) * 1000, 'ms')
+
+
+BENCHMARKS = {
+    'prompt': bench_format_prompt,
+    'library': bench_library,
+    'chat': bench_chat,
+}
+
+
+# ----------------------------------------------------------------------
+# Results
+# ----------------------------------------------------------------------
+
+def record(results: Dict, name: str, value: float, unit: str, higher_is_better: bool = False):
+    results[name] = {'value': round(value, 4), 'unit': unit, 'higher_is_better': higher_is_better}
+    print(f"  {name:<40} {value:>12.3f} {unit}")
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    Compare results with a baseline
+
+    Returns:
+        Descriptions of benchmarks that regressed by more than `threshold`
+    """
+    regressions = []
+    print(f"\n{'benchmark':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or previous['value'] <= 0:
+            continue
+
+        change = current['value'] / previous['value'] - 1
+        worse = -change if current['higher_is_better'] else change
+        flag = '  REGRESSION' if worse > threshold else ''
+        print(f"{name:<40} {previous['value']:>12.3f} {current['value']:>12.3f} {change:>+7.1%}{flag}")
+
+        if flag:
+            regressions.append(f"{name}: {previous['value']} -> {current['value']} {current['unit']}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Herotopia benchmark suite (CPU-only)")
+    parser.add_argument('--only', action='append', choices=sorted(BENCHMARKS),
+                        help="Run only these benchmark groups (repeatable)")
+    parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                        help="Synthetic library sizes in files, e.g. 1000,10000,1000000")
+    parser.add_argument('--tree-dir', type=Path, default=Path(tempfile.gettempdir()) / 'herotopia-bench-trees',
+                        help="Where synthetic libraries are built (reused between runs)")
+    parser.add_argument('--model-latency', type=float, default=0.02,
+                        help="Seconds the fake model takes per generate() call")
+    parser.add_argument('--requests', type=int, default=200, help="/chat requests in the throughput run")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent /chat clients")
+    parser.add_argument('--output', type=Path, default=Path('benchmark-results.json'))
+    parser.add_argument('--baseline', type=Path, default=Path('benchmark-baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true', help="Store the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Allowed slowdown before a benchmark counts as a regression (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    args.scales = sorted(int(scale) for scale in args.scales.split(','))
+    args.tree_dir.mkdir(parents=True, exist_ok=True)
+    install_fake_backend(args.model_latency)
+
+    results: Dict = {}
+    for name in args.only or BENCHMARKS:
+        print(f"\n[{name}]")
+        BENCHMARKS[name](results, args)
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'model_latency': args.model_latency
+        },
+        'results': results
+    }
+    args.output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2), encoding='utf-8')
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding='utf-8'))['results']
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+
+    print(f"\n✓ No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -19,6 +19,7 @@ class Config:
     LIBRARY_PATH = BASE_DIR / 'library'
     TEMPLATES_PATH = BASE_DIR / 'templates'
     STATIC_PATH = BASE_DIR / 'static'
+    CACHE_PATH = BASE_DIR / 'cache'
     
     # Model configuration
     # Available models: "TinyLlama/TinyLlama-1.1B-Chat-v1.0", "Qwen/Qwen1.5-0.5B-Chat"
@@ -81,6 +82,95 @@ N'oubliez pas:
     # Chat history context length
     MAX_HISTORY_CONTEXT = 5  # Number of previous messages to include for context
     
+    # Batch chat (/chat/batch)
+    BATCH_MAX_ITEMS = 64  # Most items accepted in one request
+    BATCH_MAX_SIZE = 16  # Most prompts per batched VLLM call
+    
+    # Periodic index refreshes and cache warmup threads (off for benchmarks)
+    BACKGROUND_TASKS_ENABLED = True
+    
+    # Library search index
+    SEARCH_INDEX_PATH = CACHE_PATH / 'search_index.sqlite3'
+    SEARCH_REFRESH_INTERVAL = 60  # Seconds between incremental index refreshes
+    SEARCH_MAX_RESULTS = 50
+    SEARCH_WORKERS = None  # Text extraction threads (None = CPU count, at most 4)
+    
+    # Retrieval-augmented answers from library documents
+    RAG_ENABLED = False  # Set to True to ground answers in library passages
+    RAG_INDEX_PATH = CACHE_PATH / 'retrieval'
+    RAG_TOP_K = 3  # Passages retrieved per message
+    RAG_MIN_SCORE = 0.1  # Minimum similarity for a passage to be used
+    RAG_MAX_CONTEXT_TOKENS = 600  # Prompt budget for retrieved passages
+    RAG_EMBEDDING_DIM = 512
+    RAG_CHUNK_TOKENS = 180  # Estimated tokens per passage (about 120 English words)
+    RAG_CHUNK_OVERLAP = 45  # Estimated tokens shared by consecutive passages
+    RAG_REFRESH_INTERVAL = 60  # Seconds between incremental index refreshes
+    
+    # Library thumbnails (images and video poster frames)
+    THUMBNAIL_CACHE_PATH = CACHE_PATH / 'thumbnails'
+    THUMBNAIL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+    THUMBNAIL_SIZE = 256  # Longest edge in pixels
+    THUMBNAIL_QUALITY = 80  # JPEG quality
+    THUMBNAIL_WORKERS = 2
+    THUMBNAIL_WAIT_SECONDS = 10  # How long a request waits for a new thumbnail
+    THUMBNAIL_MAX_AGE = 365 * 24 * 3600  # Browser cache lifetime in seconds
+    
+    # Office document and CSV previews
+    PREVIEW_CACHE_PATH = CACHE_PATH / 'previews'
+    PREVIEW_CACHE_MAX_BYTES = 256 * 1024 * 1024
+    PREVIEW_WORKERS = 2  # Conversion threads
+    PREVIEW_WAIT_SECONDS = 20  # How long a request waits for a new preview
+    PREVIEW_MAX_PAGES = 20
+    PREVIEW_ROWS_PER_PAGE = 50  # CSV and XLSX
+    PREVIEW_SLIDES_PER_PAGE = 5  # PPTX
+    PREVIEW_PARAGRAPHS_PER_PAGE = 40  # DOCX
+    PREVIEW_WARM_INTERVAL = 60  # Seconds between scans for new documents
+    
+    # Static asset pipeline (bundling, fingerprinting, pre-compression)
+    ASSET_PIPELINE_ENABLED = True
+    
+    # Library change feed
+    LIBRARY_CHANGES_PATH = CACHE_PATH / 'library_changes.sqlite3'  # Shared by all worker processes
+    LIBRARY_CHANGES_INTERVAL = 15  # Seconds between library scans
+    LIBRARY_CHANGES_MAX = 10000  # Changes kept for clients catching up
+    
+    # Folder ZIP downloads
+    ARCHIVE_CHUNK_SIZE = 1024 * 1024  # Bytes read per step while streaming
+    
+    # Admin token for staff-only endpoints (uploads, profiling); unset disables them
+    ADMIN_TOKEN = os.environ.get('HEROTOPIA_ADMIN_TOKEN')
+    
+    # Resumable library uploads
+    UPLOAD_STAGING_PATH = BASE_DIR / 'upload_staging'  # Outside the library, on the same filesystem for atomic moves
+    UPLOAD_MAX_CHUNK_BYTES = 64 * 1024 * 1024
+    UPLOAD_SESSION_TTL = 7 * 24 * 3600  # Seconds before an idle upload is discarded
+    UPLOAD_COMPLETED_TTL = 24 * 3600  # Seconds a finished upload can still be confirmed
+    
+    # Prometheus metrics (/metrics); with several worker processes, point
+    # HEROTOPIA_METRICS_DIR at a folder they share so totals cover all of them
+    METRICS_MULTIPROC_DIR = os.environ.get('HEROTOPIA_METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = 5  # Seconds between per-process snapshot writes
+    
+    # Per-request phase timing (Server-Timing headers and slow-request log)
+    REQUEST_TRACE_SAMPLE_RATE = 0.05  # Fraction of requests traced phase by phase
+    SLOW_REQUEST_THRESHOLD = 2.0  # Seconds; slower requests are logged (with phases if traced)
+    SLOW_REQUEST_LOG_PATH = BASE_DIR / 'logs' / 'slow_requests.jsonl'
+    
+    # On-demand sampling profiler (admin endpoints)
+    PROFILE_SAMPLE_INTERVAL = 0.005  # Seconds between stack samples
+    PROFILE_MAX_SECONDS = 60
+    PROFILE_MAX_REQUESTS = 100
+    
+    # Opt-in traffic recording for load replay (replay.py); unset disables it
+    TRAFFIC_RECORD_PATH = os.environ.get('HEROTOPIA_TRAFFIC_RECORD')
+    
+    # Instruction placed before retrieved passages in the prompt
+    RAG_INSTRUCTIONS = {
+        "en": "Use the following library excerpts if they are relevant. Cite them by their number, e.g. [1].",
+        "ar": "استخدم المقتطفات التالية من المكتبة إذا كانت ذات صلة. استشهد بها برقمها، مثل [1].",
+        "fr": "Utilisez les extraits suivants de la bibliothèque s'ils sont pertinents. Citez-les par leur numéro, par ex. [1]."
+    }
+    
     @classmethod
     def ensure_directories_exist(cls):
         """Create necessary directories if they don't exist"""
@@ -88,6 +178,7 @@ N'oubliez pas:
         cls.LIBRARY_PATH.mkdir(parents=True, exist_ok=True)
         cls.TEMPLATES_PATH.mkdir(parents=True, exist_ok=True)
         cls.STATIC_PATH.mkdir(parents=True, exist_ok=True)
+        cls.CACHE_PATH.mkdir(parents=True, exist_ok=True)
 
 
 # Ensure directories exist when config is imported
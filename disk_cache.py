@@ -0,0 +1,158 @@
+"""
+Disk Cache Module
+Content-addressed on-disk cache for generated artifacts (thumbnails, previews)
+with size-based least-recently-used eviction
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+# Bytes read from each end of a file when fingerprinting it
+FINGERPRINT_SAMPLE_BYTES = 1024 * 1024
+
+
+class DiskCache:
+    """
+    Stores artifacts under cache_dir/<key[:2]>/<key><suffix>
+    Keys are derived from source content, so stale entries are never served
+    and simply age out when the cache grows past its size limit
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir: Folder holding cached files
+            max_bytes: Total size above which the oldest entries are evicted
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._total_bytes = sum(
+            entry.stat().st_size for entry in self.cache_dir.glob('*/*') if entry.is_file()
+        )
+
+        # Fingerprint memo: (path, mtime_ns, size) -> digest
+        self._fingerprints: Dict[Tuple[str, int, int], str] = {}
+
+    def fingerprint(self, source: Path) -> str:
+        """
+        Compute a content fingerprint for a source file
+        Hashes the size plus the first and last megabyte, which identifies
+        multi-GB videos without reading them in full
+
+        Args:
+            source: File to fingerprint
+
+        Returns:
+            Hex digest
+        """
+        stat = source.stat()
+        memo_key = (str(source), stat.st_mtime_ns, stat.st_size)
+
+        digest = self._fingerprints.get(memo_key)
+        if digest:
+            return digest
+
+        hasher = hashlib.sha256(str(stat.st_size).encode())
+        with open(source, 'rb') as f:
+            hasher.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+            if stat.st_size > 2 * FINGERPRINT_SAMPLE_BYTES:
+                f.seek(-FINGERPRINT_SAMPLE_BYTES, os.SEEK_END)
+                hasher.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+            elif stat.st_size > FINGERPRINT_SAMPLE_BYTES:
+                hasher.update(f.read())
+
+        digest = hasher.hexdigest()
+        self._fingerprints[memo_key] = digest
+        return digest
+
+    def path_for(self, key: str, suffix: str) -> Path:
+        """Get the cache location for a key"""
+        return self.cache_dir / key[:2] / f"{key}{suffix}"
+
+    def get(self, key: str, suffix: str) -> Optional[Path]:
+        """
+        Look up a cached entry and mark it as recently used
+
+        Args:
+            key: Cache key
+            suffix: File suffix of the entry (e.g. '.jpg')
+
+        Returns:
+            Path of the cached file, or None on a miss
+        """
+        path = self.path_for(key, suffix)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key: str, suffix: str, data: bytes) -> Path:
+        """
+        Store an entry atomically and evict old entries if over the limit
+
+        Args:
+            key: Cache key
+            suffix: File suffix of the entry
+            data: File content
+
+        Returns:
+            Path of the cached file
+        """
+        path = self.path_for(key, suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file in the same folder, then rename into place
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+        except Exception:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+
+        with self._lock:
+            self._total_bytes += len(data)
+            over_limit = self._total_bytes > self.max_bytes
+
+        if over_limit:
+            self.evict()
+
+        return path
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache is below 90% of its limit"""
+        with self._lock:
+            entries = []
+            for entry in self.cache_dir.glob('*/*'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry))
+
+            total = sum(size for _, size, _ in entries)
+            target = int(self.max_bytes * 0.9)
+
+            for _, size, entry in sorted(entries, key=lambda e: e[0]):
+                if total <= target:
+                    break
+                try:
+                    entry.unlink()
+                    total -= size
+                except OSError:
+                    continue
+
+            self._total_bytes = total
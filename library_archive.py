@@ -0,0 +1,119 @@
+"""
+Library Archive Module
+Streams library folders as ZIP archives without temp files or buffering
+"""
+
+import os
+import zipfile
+from pathlib import Path
+from typing import Iterator
+
+
+# Formats that are already compressed; deflating them again wastes CPU for no gain
+STORED_EXTENSIONS = {
+    'mp4', 'webm', 'mkv', 'avi', 'mov', 'mp3', 'm4a', 'ogg',
+    'jpg', 'jpeg', 'png', 'gif', 'webp',
+    'zip', 'gz', '7z', 'rar',
+    'docx', 'pptx', 'xlsx', 'pdf',
+}
+
+
+class _ChunkSink:
+    """
+    Write-only file object that collects what zipfile writes so the
+    generator can hand it to the client and drop it immediately
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        """Return and forget everything written since the last drain"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_folder_zip(folder: Path, library_root: Path, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """
+    Generate a ZIP archive of a folder as a stream of byte chunks
+    Memory use is bounded by chunk_size regardless of folder size; entries
+    use data descriptors and ZIP64 so the output never needs seeking
+
+    Args:
+        folder: Absolute folder to archive (already validated with get_safe_path)
+        library_root: Resolved library root; files resolving outside it are skipped
+        chunk_size: Bytes read from disk per step
+
+    Yields:
+        Consecutive chunks of the ZIP file
+    """
+    sink = _ChunkSink()
+    archive_root = folder.name
+
+    with zipfile.ZipFile(sink, mode='w', allowZip64=True) as archive:
+        for dirpath, dirnames, filenames in os.walk(folder):
+            # Skip hidden folders and keep a stable order, matching LibraryManager
+            dirnames[:] = sorted((d for d in dirnames if not d.startswith('.')), key=str.lower)
+
+            for filename in sorted(filenames, key=str.lower):
+                if filename.startswith('.'):
+                    continue
+
+                file_path = Path(dirpath) / filename
+                try:
+                    # Symlinks must not leak files from outside the library
+                    file_path.resolve().relative_to(library_root)
+                except (ValueError, OSError):
+                    continue
+
+                try:
+                    if not file_path.is_file():
+                        continue
+                    # Timestamps before 1980 (not representable in ZIP) are clamped, not fatal
+                    info = zipfile.ZipInfo.from_file(
+                        file_path,
+                        arcname=f"{archive_root}/{file_path.relative_to(folder).as_posix()}",
+                        strict_timestamps=False
+                    )
+                except OSError as e:
+                    print(f"Error adding {file_path.name} to archive: {str(e)}")
+                    continue
+
+                ext = file_path.suffix.lower().lstrip('.')
+                info.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+                try:
+                    with open(file_path, 'rb') as source, archive.open(info, 'w', force_zip64=True) as entry:
+                        while True:
+                            block = source.read(chunk_size)
+                            if not block:
+                                break
+                            entry.write(block)
+                            data = sink.drain()
+                            if data:
+                                yield data
+                except OSError as e:
+                    # The entry header may already be sent; skip the rest of this file
+                    print(f"Error adding {file_path.name} to archive: {str(e)}")
+
+                data = sink.drain()
+                if data:
+                    yield data
+
+    # Central directory
+    data = sink.drain()
+    if data:
+        yield data
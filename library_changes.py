@@ -0,0 +1,210 @@
+"""
+Library Changes Module
+Versioned change feed so clients can patch their cached library tree
+instead of re-downloading it
+
+The version, epoch, change log and last scanned listing live in a SQLite
+file, so every worker process serves the same versions and a restart does
+not force clients to reload.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from library_manager import LibraryManager
+
+
+class LibraryChangeFeed:
+    """
+    Keeps a monotonically increasing library version and a bounded log of
+    added, removed and modified items
+
+    The library is scanned once per interval no matter how many clients
+    poll, so idle tabs only cost a cheap version comparison
+    """
+
+    def __init__(self, library_manager: LibraryManager, state_path: Path, max_changes: int = 10000):
+        """
+        Initialize the change feed
+
+        Args:
+            library_manager: Library manager used to scan the folder
+            state_path: SQLite file shared by all worker processes
+            max_changes: Number of changes kept; older clients must reload the tree
+        """
+        self.library_manager = library_manager
+        self.state_path = Path(state_path)
+        self.max_changes = max_changes
+
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()
+
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        self._create_schema()
+
+        # A new epoch only when the state file is new, telling clients their version is meaningless
+        self.epoch = self._connect().execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection to the state file"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly
+            conn = sqlite3.connect(str(self.state_path), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        """Create the state tables if they don't exist"""
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS snapshot (
+                path TEXT PRIMARY KEY,
+                item TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS changes (
+                version INTEGER PRIMARY KEY AUTOINCREMENT,
+                op TEXT NOT NULL,
+                path TEXT NOT NULL,
+                item TEXT
+            );
+        """)
+        # Workers starting together all keep the first epoch written
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', ?)", (uuid.uuid4().hex[:12],))
+
+    @property
+    def version(self) -> int:
+        """Current library version"""
+        row = self._connect().execute("SELECT COALESCE(MAX(version), 0) FROM changes").fetchone()
+        return row[0]
+
+    def refresh(self) -> int:
+        """
+        Scan the library and record what changed since the last scan
+
+        Returns:
+            Number of changes recorded
+        """
+        # One scan at a time across all workers, so an older scan never overwrites a newer one
+        with self._refresh_lock:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                listing = self.library_manager.get_flat_listing()
+                count = self._apply(conn, listing)
+                conn.execute('COMMIT')
+                return count
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def _apply(self, conn: sqlite3.Connection, listing: Dict[str, Dict]) -> int:
+        """Diff a fresh listing against the stored snapshot and log the changes"""
+        current = {path: json.dumps(item, sort_keys=True, ensure_ascii=False) for path, item in listing.items()}
+
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'baseline'").fetchone() is None:
+            # First scan is the baseline, not a change
+            conn.executemany("INSERT OR REPLACE INTO snapshot (path, item) VALUES (?, ?)", current.items())
+            conn.execute("INSERT INTO meta (key, value) VALUES ('baseline', '1')")
+            return 0
+
+        previous = dict(conn.execute("SELECT path, item FROM snapshot"))
+        changes = []
+
+        # Removals first, deepest paths first, so clients never touch orphans
+        for path in sorted(set(previous) - set(current), key=len, reverse=True):
+            changes.append(('removed', path, None))
+
+        # Additions and modifications, parents before children
+        for path in sorted(current, key=len):
+            if path not in previous:
+                changes.append(('added', path, current[path]))
+            elif previous[path] != current[path]:
+                changes.append(('modified', path, current[path]))
+
+        if not changes:
+            return 0
+
+        # AUTOINCREMENT hands out the versions in order and never reuses one
+        conn.executemany("INSERT INTO changes (op, path, item) VALUES (?, ?, ?)", changes)
+        conn.execute("DELETE FROM changes WHERE version <= (SELECT MAX(version) FROM changes) - ?",
+                     (self.max_changes,))
+
+        for op, path, item in changes:
+            if op == 'removed':
+                conn.execute("DELETE FROM snapshot WHERE path = ?", (path,))
+            else:
+                conn.execute("INSERT OR REPLACE INTO snapshot (path, item) VALUES (?, ?)", (path, item))
+
+        return len(changes)
+
+    def changes_since(self, since: int, epoch: Optional[str] = None) -> Tuple[int, Optional[List[Dict]]]:
+        """
+        Get the changes a client has not seen yet
+
+        Args:
+            since: Last version the client applied
+            epoch: Epoch the client's version belongs to
+
+        Returns:
+            Tuple of (current version, changes oldest first); changes is None
+            if the client must reload the tree
+        """
+        conn = self._connect()
+        version, oldest = conn.execute("SELECT COALESCE(MAX(version), 0), MIN(version) FROM changes").fetchone()
+
+        if epoch != self.epoch or since > version or since < 0:
+            return version, None
+        if since == version:
+            return version, []
+        if oldest is None or since + 1 < oldest:
+            return version, None
+
+        rows = conn.execute("""
+            SELECT version, op, path, item FROM changes
+            WHERE version > ? AND version <= ?
+            ORDER BY version
+        """, (since, version)).fetchall()
+
+        # Another worker trimmed the log between the two queries
+        if not rows or rows[0][0] != since + 1:
+            return version, None
+
+        return version, [
+            {
+                'version': row_version,
+                'op': op,
+                'path': path,
+                'item': json.loads(item) if item is not None else None
+            }
+            for row_version, op, path, item in rows
+        ]
+
+    def start_background_refresh(self, interval: float):
+        """
+        Scan the library now and then every `interval` seconds in a daemon thread
+
+        Args:
+            interval: Seconds between scans
+        """
+        def refresh_loop():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Error refreshing library change feed: {str(e)}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=refresh_loop, name='library-changes', daemon=True)
+        thread.start()
@@ -111,28 +111,87 @@ class LibraryManager:
                 
                 else:
                     # It's a file
-                    file_info = self.get_file_type_info(item.name)
-                    file_path = str(Path(relative_path) / item.name)
-                    
-                    items.append({
-                        'name': item.name,
-                        'type': 'file',
-                        'icon': file_info['icon'],
-                        'category': file_info['category'],
-                        'path': file_path,
-                        'size': item.stat().st_size,
-                        'size_human': self._format_size(item.stat().st_size)
-                    })
+                    items.append(self._file_entry(item, relative_path))
         
         except Exception as e:
             print(f"Error scanning library: {str(e)}")
         
         return items
     
+    def _file_entry(self, item: Path, relative_path: str) -> Dict:
+        """
+        Build the metadata entry for a file
+        
+        Args:
+            item: Absolute path of the file
+            relative_path: Relative path of its folder within the library
+        
+        Returns:
+            File item with type info, size and modification time
+        """
+        file_info = self.get_file_type_info(item.name)
+        stat = item.stat()
+        
+        return {
+            'name': item.name,
+            'type': 'file',
+            'icon': file_info['icon'],
+            'category': file_info['category'],
+            'path': str(Path(relative_path) / item.name),
+            'size': stat.st_size,
+            'size_human': self._format_size(stat.st_size),
+            'modified': int(stat.st_mtime)
+        }
+    
+    def get_flat_listing(self) -> Dict[str, Dict]:
+        """
+        Get every library item keyed by path
+        Same entries as get_library_structure, but folders have no 'children'
+        
+        Returns:
+            Mapping of relative path -> item metadata
+        """
+        listing = {}
+        pending = [""]
+        
+        while pending:
+            relative_path = pending.pop()
+            current_path = self.library_path / relative_path if relative_path else self.library_path
+            
+            try:
+                entries = list(os.scandir(current_path))
+            except OSError as e:
+                print(f"Error scanning library: {str(e)}")
+                continue
+            
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                
+                try:
+                    if entry.is_dir():
+                        path = str(Path(relative_path) / entry.name)
+                        listing[path] = {
+                            'name': entry.name,
+                            'type': 'folder',
+                            'icon': '📁',
+                            'path': path
+                        }
+                        pending.append(path)
+                    else:
+                        item = self._file_entry(Path(entry.path), relative_path)
+                        listing[item['path']] = item
+                except OSError:
+                    # File vanished while scanning
+                    continue
+        
+        return listing
+    
     def get_safe_path(self, filepath: str) -> Optional[Path]:
         """
         Get a safe absolute path within the library
-        Prevents directory traversal attacks
+        Prevents directory traversal attacks; hidden files and folders
+        (never listed) are not served either
         
         Args:
             filepath: Relative path from library root
@@ -140,6 +199,9 @@ class LibraryManager:
         Returns:
             Safe absolute path if valid, None otherwise
         """
+        if any(part.startswith('.') for part in Path(filepath).parts):
+            return None
+        
         try:
             # Normalize and resolve the path
             requested_path = (self.library_path / filepath).resolve()
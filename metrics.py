@@ -0,0 +1,460 @@
+"""
+Metrics Module
+Low-overhead counters, gauges and histograms exposed in the Prometheus
+text format
+
+Hot-path updates go to a per-thread shard and never take a lock; shards are
+only merged when /metrics is scraped. With several worker processes, each
+process periodically writes its totals to a shared folder and the scrape
+sums them all. Counters and histograms of workers that exited are folded
+into a persistent total so restarts never make them go down.
+"""
+
+import bisect
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+# Shard count at which registering a new thread folds the dead ones
+SHARD_PRUNE_THRESHOLD = 256
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Metric:
+    """Definition of a metric family"""
+
+    def __init__(self, name: str, kind: str, help_text: str, labelnames: Tuple[str, ...],
+                 buckets: Optional[Tuple[float, ...]] = None, aggregate: str = 'sum'):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # How gauge values from several processes combine: 'sum' or 'max'
+        self.aggregate = aggregate
+
+
+class MetricsRegistry:
+    """
+    Registry of metric families with lock-free per-thread recording
+    """
+
+    def __init__(self, multiprocess_dir: Optional[Path] = None, flush_interval: float = 5.0):
+        """
+        Initialize the registry
+
+        Args:
+            multiprocess_dir: Shared folder for per-process snapshots (None = single process)
+            flush_interval: Seconds between snapshot writes in multi-process mode
+        """
+        self._metrics: Dict[str, _Metric] = {}
+        self._local = threading.local()
+
+        # (thread, shard) for every thread that recorded something
+        self._shards: List[Tuple[threading.Thread, Dict]] = []
+        self._retired: Dict = {}
+        self._shards_lock = threading.Lock()
+        self._prune_at = SHARD_PRUNE_THRESHOLD
+
+        # Gauges set to an absolute value (not per-thread)
+        self._set_gauges: Dict = {}
+
+        self.multiprocess_dir = Path(multiprocess_dir) if multiprocess_dir else None
+        self.flush_interval = flush_interval
+        if self.multiprocess_dir:
+            self.multiprocess_dir.mkdir(parents=True, exist_ok=True)
+            self._start_flusher()
+
+    # ------------------------------------------------------------------
+    # Definitions
+    # ------------------------------------------------------------------
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        """Define a monotonically increasing counter"""
+        self._metrics[name] = _Metric(name, 'counter', help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), aggregate: str = 'sum'):
+        """Define a gauge (use inc/dec for in-progress counts, set for absolute values)"""
+        self._metrics[name] = _Metric(name, 'gauge', help_text, labelnames, aggregate=aggregate)
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """Define a histogram with cumulative buckets"""
+        self._metrics[name] = _Metric(name, 'histogram', help_text, labelnames, buckets=tuple(buckets))
+
+    # ------------------------------------------------------------------
+    # Recording (hot path)
+    # ------------------------------------------------------------------
+
+    def _shard(self) -> Dict:
+        """Get this thread's private shard, registering it on first use"""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            with self._shards_lock:
+                self._shards.append((threading.current_thread(), shard))
+                # Servers that spawn a thread per request would otherwise
+                # accumulate shards until the next scrape (or forever)
+                if len(self._shards) >= self._prune_at:
+                    self._fold_dead_shards()
+                    self._prune_at = max(SHARD_PRUNE_THRESHOLD, 2 * len(self._shards))
+        return shard
+
+    def inc(self, name: str, amount: float = 1.0, *labels: str):
+        """
+        Increase a counter or in-progress gauge
+
+        Args:
+            name: Metric name
+            amount: Amount to add (negative to decrease a gauge)
+            labels: Label values, in the order of the metric's labelnames
+        """
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def dec(self, name: str, amount: float = 1.0, *labels: str):
+        """Decrease an in-progress gauge"""
+        self.inc(name, -amount, *labels)
+
+    def set(self, name: str, value: float, *labels: str):
+        """Set a gauge to an absolute value"""
+        self._set_gauges[(name, labels)] = value
+
+    def observe(self, name: str, value: float, *labels: str):
+        """
+        Record one observation in a histogram
+
+        Args:
+            name: Metric name
+            value: Observed value
+            labels: Label values, in the order of the metric's labelnames
+        """
+        shard = self._shard()
+        key = (name, labels)
+        data = shard.get(key)
+        if data is None:
+            # Per-bucket counts, then +Inf count, then sum
+            data = [0] * (len(self._metrics[name].buckets) + 1) + [0.0]
+            shard[key] = data
+        data[bisect.bisect_left(self._metrics[name].buckets, value)] += 1
+        data[-1] += value
+
+    # ------------------------------------------------------------------
+    # Collection
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _merge(totals: Dict, key, value):
+        """Add a shard value (number or histogram list) into totals"""
+        current = totals.get(key)
+        if current is None:
+            totals[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            for i, item in enumerate(value):
+                current[i] += item
+        else:
+            totals[key] = current + value
+
+    def _fold_dead_shards(self):
+        """Fold shards of finished threads into one retired shard (caller holds the lock)"""
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                # A finished thread never writes again, so no copy is needed
+                for key, value in shard.items():
+                    self._merge(self._retired, key, value)
+        self._shards = alive
+
+    def snapshot(self) -> Dict:
+        """
+        Merge all thread shards of this process
+
+        Returns:
+            Mapping of (name, labels) -> value
+        """
+        totals: Dict = {}
+
+        with self._shards_lock:
+            self._fold_dead_shards()
+            for thread, shard in self._shards:
+                # dict.copy() is atomic under the GIL, so owners never block
+                for key, value in shard.copy().items():
+                    self._merge(totals, key, value)
+
+            for key, value in self._retired.items():
+                self._merge(totals, key, value)
+
+        totals.update(self._set_gauges)
+        return totals
+
+    def _snapshot_path(self) -> Path:
+        return self.multiprocess_dir / f"metrics-{os.getpid()}.json"
+
+    def _connect_dead(self) -> sqlite3.Connection:
+        """Open the totals of exited processes, shared by all workers"""
+        conn = sqlite3.connect(str(self.multiprocess_dir / 'dead-processes.sqlite3'), timeout=30,
+                               isolation_level=None)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS totals (
+                name TEXT NOT NULL,
+                labels TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (name, labels)
+            )
+        """)
+        return conn
+
+    @staticmethod
+    def _process_alive(pid: int) -> bool:
+        """Check whether a worker process is still running"""
+        if os.name != 'posix':
+            # os.kill(pid, 0) would terminate the process on Windows
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            return True
+        return True
+
+    def _fold_dead_processes(self, paths: List[Path]):
+        """Move counters and histograms of exited processes into the persistent totals"""
+        conn = self._connect_dead()
+        try:
+            # One folder at a time across workers, so no snapshot is counted twice
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                folded = []
+                for path in paths:
+                    try:
+                        entries = json.loads(path.read_text(encoding='utf-8'))
+                    except FileNotFoundError:
+                        # Another worker folded it first
+                        continue
+                    except (OSError, ValueError):
+                        entries = []
+
+                    for name, labels, value in entries:
+                        metric = self._metrics.get(name)
+                        # Gauges describe a live process, so they go with it
+                        if metric is None or metric.kind == 'gauge':
+                            continue
+                        labels_json = json.dumps(labels)
+                        row = conn.execute("SELECT value FROM totals WHERE name = ? AND labels = ?",
+                                           (name, labels_json)).fetchone()
+                        totals = {name: json.loads(row[0])} if row else {}
+                        self._merge(totals, name, value)
+                        conn.execute("INSERT OR REPLACE INTO totals (name, labels, value) VALUES (?, ?, ?)",
+                                     (name, labels_json, json.dumps(totals[name])))
+                    folded.append(path)
+
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+            for path in folded:
+                path.unlink(missing_ok=True)
+        finally:
+            conn.close()
+
+    def _dead_totals(self) -> List[Tuple[str, List[str], object]]:
+        """Counters and histograms accumulated by exited processes"""
+        conn = self._connect_dead()
+        try:
+            return [(name, json.loads(labels), json.loads(value))
+                    for name, labels, value in conn.execute("SELECT name, labels, value FROM totals")]
+        finally:
+            conn.close()
+
+    def flush(self):
+        """Write this process's totals to the shared folder"""
+        if not self.multiprocess_dir:
+            return
+
+        entries = [[name, list(labels), value] for (name, labels), value in self.snapshot().items()]
+        path = self._snapshot_path()
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(entries), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def _start_flusher(self):
+        """Flush snapshots periodically in a daemon thread"""
+        def flush_loop():
+            while True:
+                time.sleep(self.flush_interval)
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Error writing metrics snapshot: {str(e)}")
+
+        thread = threading.Thread(target=flush_loop, name='metrics-flush', daemon=True)
+        thread.start()
+
+    def collect(self) -> Dict:
+        """
+        Get totals across all worker processes
+
+        Returns:
+            Mapping of (name, labels) -> value
+        """
+        totals = self.snapshot()
+        if not self.multiprocess_dir:
+            return totals
+
+        # Processes that stopped flushing are gone or hung; only their gauges are dropped
+        cutoff = time.time() - self.flush_interval * 5
+        own_path = self._snapshot_path()
+        snapshots = []
+        dead_paths = []
+
+        for path in self.multiprocess_dir.glob('metrics-*.json'):
+            if path == own_path:
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    pid = path.stem.split('-', 1)[1]
+                    # A hung worker may flush again, so only exited ones are folded
+                    if pid.isdigit() and not self._process_alive(int(pid)):
+                        dead_paths.append(path)
+                    continue
+                snapshots.append(json.loads(path.read_text(encoding='utf-8')))
+            except (OSError, ValueError):
+                continue
+
+        try:
+            if dead_paths:
+                self._fold_dead_processes(dead_paths)
+            snapshots.append(self._dead_totals())
+        except sqlite3.Error as e:
+            print(f"Error reading metrics of exited processes: {str(e)}")
+
+        for entries in snapshots:
+            for name, labels, value in entries:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    continue
+                key = (name, tuple(labels))
+                if metric.kind == 'gauge' and metric.aggregate == 'max':
+                    totals[key] = max(totals.get(key, value), value)
+                else:
+                    self._merge(totals, key, value)
+
+        return totals
+
+    # ------------------------------------------------------------------
+    # Exposition
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _format_labels(labelnames: Tuple[str, ...], labels: Tuple[str, ...], extra: str = '') -> str:
+        """Render a Prometheus label set"""
+        pairs = []
+        for labelname, value in zip(labelnames, labels):
+            escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            pairs.append(f'{labelname}="{escaped}"')
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    @staticmethod
+    def _format_value(value: float) -> str:
+        if value == float('inf'):
+            return '+Inf'
+        return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format
+
+        Returns:
+            Exposition text
+        """
+        totals = self.collect()
+        by_metric: Dict[str, List] = {}
+        for (name, labels), value in totals.items():
+            by_metric.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.help_text}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+
+            for labels, value in sorted(by_metric.get(name, []), key=lambda entry: entry[0]):
+                if metric.kind != 'histogram':
+                    lines.append(f"{name}{self._format_labels(metric.labelnames, labels)} {self._format_value(value)}")
+                    continue
+
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), value[:-1]):
+                    cumulative += count
+                    le = f'le="{self._format_value(bound)}"'
+                    lines.append(f"{name}_bucket{self._format_labels(metric.labelnames, labels, le)} {cumulative}")
+                label_text = self._format_labels(metric.labelnames, labels)
+                lines.append(f"{name}_sum{label_text} {self._format_value(value[-1])}")
+                lines.append(f"{name}_count{label_text} {cumulative}")
+
+        return '\n'.join(lines) + '\n'
+
+
+def create_app_metrics(multiprocess_dir: Optional[Path] = None, flush_interval: float = 5.0) -> MetricsRegistry:
+    """
+    Create the registry with all Herotopia metrics defined
+
+    Args:
+        multiprocess_dir: Shared folder for per-process snapshots (None = single process)
+        flush_interval: Seconds between snapshot writes in multi-process mode
+
+    Returns:
+        Metrics registry
+    """
+    metrics = MetricsRegistry(multiprocess_dir, flush_interval)
+
+    # HTTP
+    metrics.counter('herotopia_http_requests_total',
+                    'HTTP requests by route, method, status and chat language',
+                    ('route', 'method', 'status', 'language'))
+    metrics.histogram('herotopia_http_request_duration_seconds',
+                      'HTTP request latency by route and chat language',
+                      ('route', 'language'))
+
+    # Chat and generation
+    metrics.gauge('herotopia_chat_requests_in_progress',
+                  'Chat requests being handled')
+    metrics.gauge('herotopia_generation_queue_depth',
+                  'Generation calls waiting for the model')
+    metrics.gauge('herotopia_generations_in_progress',
+                  'Generations currently running on the model')
+    metrics.counter('herotopia_prompt_tokens_total',
+                    'Prompt tokens processed', ('language',))
+    metrics.counter('herotopia_completion_tokens_total',
+                    'Completion tokens generated', ('language',))
+    metrics.histogram('herotopia_generation_duration_seconds',
+                      'Model generation time', ('language',))
+    metrics.histogram('herotopia_generation_tokens_per_second',
+                      'Completion tokens per second of each generation', ('language',),
+                      buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000))
+    metrics.histogram('herotopia_time_to_first_token_seconds',
+                      'Time from request arrival to the first generated token', ('language',))
+
+    # Library
+    metrics.histogram('herotopia_library_scan_duration_seconds',
+                      'Duration of /library tree scans')
+    metrics.gauge('herotopia_library_items',
+                  'Files and folders found by the last /library scan', aggregate='max')
+    metrics.counter('herotopia_library_bytes_served_total',
+                    'Bytes sent by library file downloads')
+
+    return metrics
@@ -3,9 +3,11 @@ Model Handler Module
 Manages VLLM model loading and inference
 """
 
+import threading
+import time
 import torch
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, List, Optional
 
 try:
     from vllm import LLM, SamplingParams
@@ -13,6 +15,7 @@ except ImportError:
     raise ImportError("VLLM not installed. Install with: pip install vllm torch")
 
 from config import Config
+from tracing import record_phase, trace_phase
 
 
 class ModelHandler:
@@ -21,20 +24,26 @@ class ModelHandler:
     Supports streaming and batch inference
     """
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, metrics=None):
         """
         Initialize the model handler
         
         Args:
             config: Configuration object containing model settings
+            metrics: MetricsRegistry for token and latency metrics (optional)
         """
         self.config = config
+        self.metrics = metrics
         self.model = None
         self.model_name = config.MODEL_NAME
         self.max_tokens = config.MAX_TOKENS
         self.temperature = config.TEMPERATURE
         self.top_p = config.TOP_P
         
+        # The offline VLLM engine is not thread-safe, so generation calls
+        # from concurrent requests take turns; callers waiting here are the queue
+        self._generate_lock = threading.Lock()
+        
         # Load the model
         self._load_model()
     
@@ -61,14 +70,19 @@ class ModelHandler:
             print(f"✗ Failed to load model: {str(e)}")
             raise
     
-    def _format_prompt(self, message: str, language: str, chat_history: List[Dict]) -> str:
+    def _format_prompt(self,
+                       message: str,
+                       language: str,
+                       chat_history: List[Dict],
+                       passages: Optional[List[Dict]] = None) -> str:
         """
-        Format the prompt with system message and chat history
+        Format the prompt with system message, library context and chat history
         
         Args:
             message: Current user message
             language: Language code (en, ar, fr)
             chat_history: Previous messages for context
+            passages: Retrieved library passages to ground the answer (optional)
         
         Returns:
             Formatted prompt string
@@ -89,20 +103,97 @@ class ModelHandler:
             elif role == "assistant":
                 history_text += f"Assistant: {content}\n"
         
+        # Build library context with numbered citations
+        context_text = ""
+        if passages:
+            instructions = self.config.RAG_INSTRUCTIONS.get(language, self.config.RAG_INSTRUCTIONS["en"])
+            context_text = f"[LIBRARY]\n{instructions}\n"
+            for i, passage in enumerate(passages, start=1):
+                context_text += f"[{i}] ({passage['url']}) {passage['text']}\n"
+            context_text += "\n"
+        
         # Format complete prompt
         prompt = f"""[SYSTEM]
 {system_prompt}
 
-[CONVERSATION]
+{context_text}[CONVERSATION]
 {history_text}User: {message}
 Assistant: """
         
         return prompt
     
+    def _generate(self, prompts, sampling_params, language: str):
+        """
+        Run the model, one call at a time, and record generation metrics
+        
+        Args:
+            prompts: Prompt string or list of prompts
+            sampling_params: VLLM sampling parameters
+            language: Language code used as the metrics label
+        
+        Returns:
+            VLLM request outputs
+        """
+        metrics = self.metrics
+        if metrics:
+            metrics.inc('herotopia_generation_queue_depth')
+        
+        queued = time.perf_counter()
+        with self._generate_lock:
+            start = time.perf_counter()
+            record_phase('queue', start - queued)
+            if metrics:
+                metrics.dec('herotopia_generation_queue_depth')
+                metrics.inc('herotopia_generations_in_progress')
+            try:
+                outputs = self.model.generate(prompts, sampling_params=sampling_params)
+            finally:
+                if metrics:
+                    metrics.dec('herotopia_generations_in_progress')
+            duration = time.perf_counter() - start
+        
+        record_phase('generate', duration)
+        self._record_engine_phases(outputs)
+        if metrics:
+            self._record_generation(outputs, duration, language)
+        return outputs
+    
+    @staticmethod
+    def _record_engine_phases(outputs):
+        """Split generation into prefill and decode when VLLM reports per-request timings"""
+        timings = getattr(outputs[0], 'metrics', None) if outputs else None
+        first_scheduled = getattr(timings, 'first_scheduled_time', None)
+        first_token = getattr(timings, 'first_token_time', None)
+        last_token = getattr(timings, 'last_token_time', None)
+        if first_scheduled and first_token:
+            record_phase('prefill', first_token - first_scheduled)
+            if last_token:
+                record_phase('decode', last_token - first_token)
+    
+    def _record_generation(self, outputs, duration: float, language: str):
+        """Record token counts, throughput and time to first token"""
+        prompt_tokens = sum(len(output.prompt_token_ids or []) for output in outputs)
+        completion_tokens = sum(len(output.outputs[0].token_ids) for output in outputs if output.outputs)
+        
+        self.metrics.inc('herotopia_prompt_tokens_total', prompt_tokens, language)
+        self.metrics.inc('herotopia_completion_tokens_total', completion_tokens, language)
+        self.metrics.observe('herotopia_generation_duration_seconds', duration, language)
+        if duration > 0:
+            self.metrics.observe('herotopia_generation_tokens_per_second', completion_tokens / duration, language)
+        
+        # Newer VLLM releases attach per-request timings to each output
+        for output in outputs:
+            timings = getattr(output, 'metrics', None)
+            first_token_time = getattr(timings, 'first_token_time', None)
+            arrival_time = getattr(timings, 'arrival_time', None)
+            if first_token_time and arrival_time:
+                self.metrics.observe('herotopia_time_to_first_token_seconds', first_token_time - arrival_time, language)
+    
     def generate_response(self, 
                          message: str, 
                          language: str = "en",
-                         chat_history: List[Dict] = None) -> str:
+                         chat_history: List[Dict] = None,
+                         passages: Optional[List[Dict]] = None) -> str:
         """
         Generate a response using the VLLM model
         
@@ -110,6 +201,7 @@ Assistant: """
             message: User message
             language: Language code (en, ar, fr)
             chat_history: Previous chat messages for context
+            passages: Retrieved library passages to ground the answer (optional)
         
         Returns:
             Generated response string
@@ -121,7 +213,8 @@ Assistant: """
             chat_history = []
         
         # Format the complete prompt
-        prompt = self._format_prompt(message, language, chat_history)
+        with trace_phase('format'):
+            prompt = self._format_prompt(message, language, chat_history, passages)
         
         try:
             # Create sampling parameters
@@ -133,10 +226,7 @@ Assistant: """
             )
             
             # Generate response
-            outputs = self.model.generate(
-                prompt,
-                sampling_params=sampling_params
-            )
+            outputs = self._generate(prompt, sampling_params, language)
             
             # Extract the generated text
             if outputs and len(outputs) > 0:
@@ -149,54 +239,75 @@ Assistant: """
             print(f"Error during generation: {str(e)}")
             return f"Error generating response: {str(e)}"
     
-    def batch_generate(self, 
-                      messages: List[str], 
-                      language: str = "en") -> List[str]:
+    def batch_generate(self, items: List[Dict], max_batch_size: int = 16) -> Iterator[Dict]:
         """
-        Generate responses for multiple messages
+        Generate responses for many independent conversations
+        Items are grouped by language and prompt length, each group runs as one
+        batched VLLM call, and results are yielded as soon as their group is done
         
         Args:
-            messages: List of user messages
-            language: Language code (en, ar, fr)
+            items: Dicts with 'message', 'language', 'history' and optional 'passages'
+            max_batch_size: Most prompts per VLLM call
         
-        Returns:
-            List of generated responses
+        Yields:
+            {'index': i, 'response': text} or {'index': i, 'error': message},
+            in completion order (shortest prompts first)
         """
         if not self.model:
             raise RuntimeError("Model not loaded")
         
-        # Format prompts for batch processing
-        prompts = [
-            self._format_prompt(msg, language, [])
-            for msg in messages
-        ]
+        # Format every prompt with its own history
+        prompts = {}
+        for index, item in enumerate(items):
+            try:
+                prompts[index] = self._format_prompt(
+                    item['message'],
+                    item.get('language', 'en'),
+                    item.get('history') or [],
+                    item.get('passages')
+                )
+            except Exception as e:
+                yield {'index': index, 'error': f"Invalid item: {str(e)}"}
         
-        try:
-            # Create sampling parameters
-            sampling_params = SamplingParams(
-                temperature=self.temperature,
-                top_p=self.top_p,
-                max_tokens=self.max_tokens,
-                skip_special_tokens=True
-            )
-            
-            # Generate responses in batch
-            outputs = self.model.generate(
-                prompts,
-                sampling_params=sampling_params
-            )
-            
-            # Extract responses
-            responses = [
-                output.outputs[0].text.strip() 
-                for output in outputs
-            ]
-            
-            return responses
+        # Same system prompt and similar lengths batch best, and short prompts finish first
+        order = sorted(prompts, key=lambda i: (items[i].get('language', 'en'), len(prompts[i])))
+        groups = []
+        for index in order:
+            language = items[index].get('language', 'en')
+            if groups and groups[-1][0] == language and len(groups[-1][1]) < max_batch_size:
+                groups[-1][1].append(index)
+            else:
+                groups.append((language, [index]))
+        groups.sort(key=lambda group: len(prompts[group[1][0]]))
+        
+        sampling_params = SamplingParams(
+            temperature=self.temperature,
+            top_p=self.top_p,
+            max_tokens=self.max_tokens,
+            skip_special_tokens=True
+        )
         
+        for language, indexes in groups:
+            yield from self._generate_group(indexes, prompts, sampling_params, language)
+    
+    def _generate_group(self, indexes: List[int], prompts: Dict[int, str], sampling_params, language: str) -> Iterator[Dict]:
+        """Run one batch; if it fails, retry its items one by one so only bad items fail"""
+        try:
+            outputs = self._generate([prompts[i] for i in indexes], sampling_params, language)
         except Exception as e:
+            if len(indexes) > 1:
+                for index in indexes:
+                    yield from self._generate_group([index], prompts, sampling_params, language)
+                return
             print(f"Error during batch generation: {str(e)}")
-            return [f"Error: {str(e)}"] * len(messages)
+            yield {'index': indexes[0], 'error': f"Error generating response: {str(e)}"}
+            return
+        
+        for index, output in zip(indexes, outputs):
+            if output.outputs:
+                yield {'index': index, 'response': output.outputs[0].text.strip()}
+            else:
+                yield {'index': index, 'error': "I couldn't generate a response. Please try again."}
 
 
 # Example usage and testing function
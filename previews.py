@@ -0,0 +1,416 @@
+"""
+Previews Module
+Converts office documents and CSV files into lightweight paginated HTML
+so they can be checked without downloading the full file
+"""
+
+import csv
+import html
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Optional
+from xml.etree import ElementTree
+
+from disk_cache import DiskCache
+
+
+# OOXML namespaces
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+DRAWING_NS = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+# Bumped when converter output changes, so stale cached previews are not served
+CONVERTER_VERSION = 2
+
+# Widest XLSX row shown; bounds the padding a stray far-right cell (e.g. XFD1) causes
+XLSX_MAX_COLUMNS = 256
+
+
+def _table_html(rows: List[List[str]], header: bool) -> str:
+    """Render rows as an HTML table"""
+    parts = ['<table class="preview-table">']
+    for i, row in enumerate(rows):
+        tag = 'th' if header and i == 0 else 'td'
+        cells = ''.join(f'<{tag}>{html.escape(cell)}</{tag}>' for cell in row)
+        parts.append(f'<tr>{cells}</tr>')
+    parts.append('</table>')
+    return ''.join(parts)
+
+
+def _paginate_rows(rows: List[List[str]], rows_per_page: int) -> List[str]:
+    """Split table rows into pages, repeating the header row on each page"""
+    if not rows:
+        return []
+
+    header, body = rows[0], rows[1:]
+    pages = []
+    for start in range(0, max(len(body), 1), rows_per_page):
+        pages.append(_table_html([header] + body[start:start + rows_per_page], header=True))
+    return pages
+
+
+def _docx_pages(path: Path, limits: Dict) -> Dict:
+    """Convert DOCX paragraphs into pages of HTML"""
+    with zipfile.ZipFile(path) as archive:
+        root = ElementTree.fromstring(archive.read('word/document.xml'))
+
+    paragraphs = []
+    for paragraph in root.iter(f'{WORD_NS}p'):
+        text = ''.join(node.text for node in paragraph.iter(f'{WORD_NS}t') if node.text)
+        if text.strip():
+            paragraphs.append(f'<p>{html.escape(text)}</p>')
+
+    per_page = limits['paragraphs_per_page']
+    max_items = limits['max_pages'] * per_page
+    truncated = len(paragraphs) > max_items
+    paragraphs = paragraphs[:max_items]
+
+    pages = [''.join(paragraphs[i:i + per_page]) for i in range(0, len(paragraphs), per_page)]
+    return {'pages': pages, 'truncated': truncated}
+
+
+def _pptx_pages(path: Path, limits: Dict) -> Dict:
+    """Convert PPTX slide text into pages of HTML"""
+    with zipfile.ZipFile(path) as archive:
+        slide_names = [
+            name for name in archive.namelist()
+            if re.fullmatch(r'ppt/slides/slide\d+\.xml', name)
+        ]
+        slide_names.sort(key=lambda name: int(re.search(r'\d+', name.rsplit('/', 1)[1]).group()))
+
+        per_page = limits['slides_per_page']
+        max_slides = limits['max_pages'] * per_page
+        truncated = len(slide_names) > max_slides
+
+        slides = []
+        for number, name in enumerate(slide_names[:max_slides], start=1):
+            root = ElementTree.fromstring(archive.read(name))
+            lines = []
+            for paragraph in root.iter(f'{DRAWING_NS}p'):
+                text = ''.join(node.text for node in paragraph.iter(f'{DRAWING_NS}t') if node.text)
+                if text.strip():
+                    lines.append(html.escape(text))
+
+            body = ''.join(f'<li>{line}</li>' for line in lines)
+            slides.append(
+                f'<section class="preview-slide"><h6>Slide {number}</h6><ul>{body}</ul></section>'
+            )
+
+    pages = [''.join(slides[i:i + per_page]) for i in range(0, len(slides), per_page)]
+    return {'pages': pages, 'truncated': truncated}
+
+
+def _column_index(reference: Optional[str]) -> Optional[int]:
+    """Zero-based column of a cell reference such as 'C5' (None if missing)"""
+    match = re.match(r'[A-Z]+', reference or '')
+    if not match:
+        return None
+    index = 0
+    for letter in match.group():
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def _xlsx_pages(path: Path, limits: Dict) -> Dict:
+    """Convert the first worksheet of an XLSX file into pages of HTML tables"""
+    max_rows = limits['max_pages'] * limits['rows_per_page'] + 1
+
+    with zipfile.ZipFile(path) as archive:
+        shared_strings = []
+        if 'xl/sharedStrings.xml' in archive.namelist():
+            root = ElementTree.fromstring(archive.read('xl/sharedStrings.xml'))
+            for item in root.iter(f'{SHEET_NS}si'):
+                shared_strings.append(''.join(node.text or '' for node in item.iter(f'{SHEET_NS}t')))
+
+        sheet_names = sorted(
+            name for name in archive.namelist()
+            if re.fullmatch(r'xl/worksheets/sheet\d+\.xml', name)
+        )
+        if not sheet_names:
+            return {'pages': [], 'truncated': False}
+
+        rows = []
+        truncated = False
+        with archive.open(sheet_names[0]) as sheet:
+            # Stream the sheet so huge workbooks stop parsing after max_rows
+            for _, element in ElementTree.iterparse(sheet):
+                if element.tag != f'{SHEET_NS}row':
+                    continue
+                if len(rows) >= max_rows:
+                    truncated = True
+                    break
+
+                row = []
+                for cell in element.iter(f'{SHEET_NS}c'):
+                    # Empty cells are omitted from the XML; place values by their column
+                    column = _column_index(cell.get('r'))
+                    value = cell.find(f'{SHEET_NS}v')
+                    inline = cell.find(f'{SHEET_NS}is')
+                    text = ''
+                    if cell.get('t') == 's' and value is not None:
+                        text = shared_strings[int(value.text)]
+                    elif inline is not None:
+                        text = ''.join(node.text or '' for node in inline.iter(f'{SHEET_NS}t'))
+                    elif value is not None:
+                        text = value.text or ''
+
+                    if column is None or column < len(row):
+                        row.append(text)
+                    elif column < XLSX_MAX_COLUMNS:
+                        row.extend([''] * (column - len(row)))
+                        row.append(text)
+
+                rows.append(row)
+                element.clear()
+
+    return {'pages': _paginate_rows(rows, limits['rows_per_page']), 'truncated': truncated}
+
+
+def _csv_pages(path: Path, limits: Dict) -> Dict:
+    """Convert the first rows of a CSV file into pages of HTML tables"""
+    max_rows = limits['max_pages'] * limits['rows_per_page'] + 1
+
+    rows = []
+    truncated = False
+    with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample)
+        except csv.Error:
+            dialect = csv.excel
+
+        for row in csv.reader(f, dialect):
+            if len(rows) >= max_rows:
+                truncated = True
+                break
+            rows.append(row)
+
+    return {'pages': _paginate_rows(rows, limits['rows_per_page']), 'truncated': truncated}
+
+
+CONVERTERS = {
+    'docx': _docx_pages,
+    'pptx': _pptx_pages,
+    'xlsx': _xlsx_pages,
+    'csv': _csv_pages,
+}
+
+
+def convert_document(path_str: str, limits: Dict) -> Dict:
+    """
+    Convert a document into paginated HTML
+
+    Args:
+        path_str: Absolute path of the document
+        limits: Pagination limits (see DocumentPreviewer.limits)
+
+    Returns:
+        Dictionary with 'pages' (list of HTML strings) and 'truncated'
+    """
+    path = Path(path_str)
+    converter = CONVERTERS[path.suffix.lower().lstrip('.')]
+    return converter(path, limits)
+
+
+class PreviewError(Exception):
+    """Document that cannot be previewed; remembered until the file changes"""
+
+
+class DocumentPreviewer:
+    """
+    Builds and caches lightweight previews of DOCX, PPTX, XLSX and CSV files
+    Conversions run in a thread pool (not processes: spawned workers would
+    re-import app.py and load the model again); results are cached on disk by
+    content fingerprint and modification time
+    """
+
+    EXTENSIONS = set(CONVERTERS)
+
+    def __init__(self,
+                 library_path: Path,
+                 cache: DiskCache,
+                 workers: int = 2,
+                 max_pages: int = 20,
+                 rows_per_page: int = 50,
+                 slides_per_page: int = 5,
+                 paragraphs_per_page: int = 40):
+        """
+        Initialize the previewer
+
+        Args:
+            library_path: Path to the library folder
+            cache: Disk cache for converted previews
+            workers: Number of conversion threads
+            max_pages: Maximum number of preview pages per document
+            rows_per_page: Table rows per page (CSV, XLSX)
+            slides_per_page: Slides per page (PPTX)
+            paragraphs_per_page: Paragraphs per page (DOCX)
+        """
+        self.library_path = Path(library_path)
+        self.cache = cache
+        self.workers = workers
+        self.limits = {
+            'max_pages': max_pages,
+            'rows_per_page': rows_per_page,
+            'slides_per_page': slides_per_page,
+            'paragraphs_per_page': paragraphs_per_page,
+        }
+
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        # Files already warmed: relative path -> mtime_ns
+        self._warmed: Dict[str, int] = {}
+
+    def supports(self, source: Path) -> bool:
+        """Check whether a preview can be built for a file"""
+        return source.suffix.lower().lstrip('.') in self.EXTENSIONS
+
+    def cache_key(self, source: Path) -> str:
+        """Key a preview by source content, modification time, limits and converter version"""
+        limits = '-'.join(str(self.limits[name]) for name in sorted(self.limits))
+        return f"{self.cache.fingerprint(source)[:40]}-{source.stat().st_mtime_ns}-{limits}-v{CONVERTER_VERSION}"
+
+    def get(self, source: Path, timeout: float) -> Optional[Dict]:
+        """
+        Get the preview of a document, converting it if needed
+
+        Args:
+            source: Library file
+            timeout: Seconds to wait for conversion before giving up
+
+        Returns:
+            Preview dictionary, or None if it is not ready in time
+
+        Raises:
+            PreviewError: If conversion failed for this version of the file
+        """
+        key = self.cache_key(source)
+
+        cached = self.cache.get(key, '.json')
+        if cached:
+            try:
+                return json.loads(cached.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                pass
+
+        failed = self.cache.get(key, '.failed')
+        if failed:
+            raise PreviewError(failed.read_text(encoding='utf-8', errors='replace'))
+
+        future = self.submit(source, key)
+        try:
+            return future.result(timeout=timeout)
+        except Exception as e:
+            # Still running jobs are cached when they finish
+            if not future.done():
+                return None
+            print(f"Error building preview for {source.name}: {str(e)}")
+            raise PreviewError(str(e)) from e
+
+    def submit(self, source: Path, key: Optional[str] = None) -> Future:
+        """
+        Queue a conversion, e.g. to warm the cache for a new file
+
+        Args:
+            source: Library file
+            key: Precomputed cache key (optional)
+
+        Returns:
+            Future resolving to the preview dictionary
+        """
+        key = key or self.cache_key(source)
+
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='preview')
+                conversion = self._pool.submit(convert_document, str(source), self.limits)
+                future = Future()
+                conversion.add_done_callback(lambda done: self._store(key, done, future))
+                self._pending[key] = future
+
+        return future
+
+    def _store(self, key: str, conversion: Future, future: Future):
+        """Cache a finished conversion (or a failure marker) and resolve the caller's future"""
+        with self._lock:
+            self._pending.pop(key, None)
+
+        try:
+            preview = conversion.result()
+        except Exception as e:
+            # Keyed by content, so a fixed file gets a fresh attempt
+            try:
+                self.cache.put(key, '.failed', str(e).encode('utf-8'))
+            except OSError:
+                pass
+            future.set_exception(e)
+            return
+
+        try:
+            self.cache.put(key, '.json', json.dumps(preview, ensure_ascii=False).encode('utf-8'))
+            future.set_result(preview)
+        except Exception as e:
+            future.set_exception(e)
+
+    def warm(self) -> int:
+        """
+        Queue previews for supported files that are new or changed since the last call
+
+        Returns:
+            Number of files queued
+        """
+        queued = 0
+        root = str(self.library_path)
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for filename in filenames:
+                source = Path(dirpath) / filename
+                if filename.startswith('.') or not self.supports(source):
+                    continue
+                try:
+                    mtime_ns = source.stat().st_mtime_ns
+                except OSError:
+                    continue
+
+                rel_path = Path(os.path.relpath(source, root)).as_posix()
+                if self._warmed.get(rel_path) == mtime_ns:
+                    continue
+
+                self._warmed[rel_path] = mtime_ns
+                key = self.cache_key(source)
+                if not self.cache.get(key, '.json') and not self.cache.get(key, '.failed'):
+                    self.submit(source, key)
+                    queued += 1
+
+        return queued
+
+    def start_background_warmup(self, interval: float):
+        """
+        Warm the preview cache now and then every `interval` seconds in a daemon thread
+
+        Args:
+            interval: Seconds between library scans
+        """
+        def warmup_loop():
+            while True:
+                try:
+                    queued = self.warm()
+                    if queued:
+                        print(f"✓ Queued {queued} document previews")
+                except Exception as e:
+                    print(f"Error warming preview cache: {str(e)}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=warmup_loop, name='preview-warmup', daemon=True)
+        thread.start()
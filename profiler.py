@@ -0,0 +1,303 @@
+"""
+Profiler Module
+On-demand sampling profiler for the running server
+Stacks of all threads are sampled with sys._current_frames(), so nothing is
+hooked into the interpreter and there is no cost while no profile is running.
+Output is collapsed stacks (flamegraph.pl, speedscope) or speedscope JSON.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional, Tuple
+
+
+# (function name, file, first line of the function)
+Frame = Tuple[str, str, int]
+
+
+class ProfileError(Exception):
+    """Profiling request that cannot be started; carries the HTTP status to return"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class StackSampler:
+    """
+    Background thread that periodically records the stack of every thread
+    """
+
+    def __init__(self, interval: float, thread_filter: Optional[Callable[[], frozenset]] = None):
+        """
+        Initialize the sampler
+
+        Args:
+            interval: Seconds between samples
+            thread_filter: Returns the thread idents to sample (None = all threads)
+        """
+        self.interval = interval
+        self.thread_filter = thread_filter
+        self.samples: Counter = Counter()
+        self.started = None
+        self.duration = 0.0
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start sampling"""
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self.started is not None:
+            self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        own_ident = threading.get_ident()
+
+        while not self._stop.wait(self.interval):
+            wanted = self.thread_filter() if self.thread_filter else None
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident or (wanted is not None and ident not in wanted):
+                    continue
+
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                stack.reverse()
+
+                self.samples[(names.get(ident, str(ident)), tuple(stack))] += 1
+
+
+def _frame_label(frame: Frame) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def to_collapsed(samples: Counter) -> str:
+    """
+    Render samples as collapsed stacks, one 'thread;outer;...;inner count' per line
+
+    Args:
+        samples: Counter of (thread name, stack) -> sample count
+
+    Returns:
+        Collapsed stack text
+    """
+    lines = []
+    for (thread_name, stack), count in samples.most_common():
+        frames = [thread_name.replace(';', ':')] + [_frame_label(frame).replace(';', ':') for frame in stack]
+        lines.append(f"{';'.join(frames)} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+def to_speedscope(samples: Counter, interval: float, name: str) -> Dict:
+    """
+    Render samples as a speedscope file with one sampled profile per thread
+
+    Args:
+        samples: Counter of (thread name, stack) -> sample count
+        interval: Seconds between samples (weight of one sample)
+        name: Profile name shown in speedscope
+
+    Returns:
+        speedscope JSON document
+    """
+    frames = []
+    frame_index: Dict[Frame, int] = {}
+    profiles: Dict[str, Dict] = {}
+
+    for (thread_name, stack), count in samples.items():
+        indexes = []
+        for frame in stack:
+            if frame not in frame_index:
+                frame_index[frame] = len(frames)
+                frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+            indexes.append(frame_index[frame])
+
+        profile = profiles.setdefault(thread_name, {
+            'type': 'sampled',
+            'name': thread_name,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': 0,
+            'samples': [],
+            'weights': []
+        })
+        profile['samples'].append(indexes)
+        profile['weights'].append(count * interval)
+        profile['endValue'] += count * interval
+
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'herotopia',
+        'shared': {'frames': frames},
+        'profiles': list(profiles.values())
+    }
+
+
+class Profiler:
+    """
+    Runs timed profiles of the whole process, or profiles the next N
+    requests to a route (sampling only the threads handling them)
+    """
+
+    def __init__(self, interval: float = 0.005, max_seconds: float = 60, max_requests: int = 100):
+        """
+        Initialize the profiler
+
+        Args:
+            interval: Seconds between samples
+            max_seconds: Longest allowed timed profile
+            max_requests: Most requests a route profile may cover
+        """
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.max_requests = max_requests
+
+        # Checked on every request; everything else only runs while armed
+        self.armed = False
+
+        self._lock = threading.Lock()
+        self._route: Optional[str] = None
+        self._remaining = 0
+        self._requested = 0
+        self._completed = 0
+        self._active = set()
+        self._sampler: Optional[StackSampler] = None
+        self._samples: Counter = Counter()
+        self._result: Optional[Counter] = None
+
+    def profile_for(self, seconds: float) -> Counter:
+        """
+        Sample every thread for a number of seconds (blocks the caller)
+
+        Args:
+            seconds: Profile duration
+
+        Returns:
+            Counter of (thread name, stack) -> sample count
+        """
+        if not 0 < seconds <= self.max_seconds:
+            raise ProfileError(f"'seconds' must be between 0 and {self.max_seconds}")
+
+        sampler = StackSampler(self.interval)
+        sampler.start()
+        time.sleep(seconds)
+        sampler.stop()
+        return sampler.samples
+
+    # ------------------------------------------------------------------
+    # Route profiles
+    # ------------------------------------------------------------------
+
+    def arm(self, route: str, count: int) -> Dict:
+        """
+        Profile the next `count` requests matching a route
+
+        Args:
+            route: Route rule (e.g. '/library/<path:filepath>') or exact path
+            count: Number of requests to profile
+
+        Returns:
+            Profile status
+        """
+        if not route:
+            raise ProfileError("Missing 'route'")
+        if not 0 < count <= self.max_requests:
+            raise ProfileError(f"'count' must be between 1 and {self.max_requests}")
+
+        with self._lock:
+            if self.armed or self._active:
+                raise ProfileError("A route profile is already running", 409)
+            self._route = route
+            self._remaining = count
+            self._requested = count
+            self._completed = 0
+            self._samples = Counter()
+            self._result = None
+            self.armed = True
+            return self._status()
+
+    def disarm(self):
+        """Cancel the route profile and drop its results"""
+        with self._lock:
+            self.armed = False
+            self._remaining = 0
+            self._route = None
+            self._result = None
+
+    def request_started(self, rule: Optional[str], path: str) -> bool:
+        """
+        Called for each request while armed
+
+        Args:
+            rule: Matched route rule
+            path: Request path
+
+        Returns:
+            True if this request is being profiled
+        """
+        with self._lock:
+            if not self.armed or self._remaining <= 0 or self._route not in (rule, path):
+                return False
+
+            self._remaining -= 1
+            self._active.add(threading.get_ident())
+            if self._sampler is None:
+                self._sampler = StackSampler(self.interval, lambda: frozenset(self._active))
+                self._sampler.start()
+            return True
+
+    def request_finished(self):
+        """Called when a profiled request is done"""
+        sampler = None
+        with self._lock:
+            self._active.discard(threading.get_ident())
+            self._completed += 1
+            if not self._active:
+                sampler, self._sampler = self._sampler, None
+
+        if sampler:
+            sampler.stop()
+
+        with self._lock:
+            if sampler:
+                self._samples.update(sampler.samples)
+            if self.armed and self._completed >= self._requested and not self._active:
+                self.armed = False
+                self._result = self._samples
+
+    def result(self) -> Tuple[Dict, Optional[Counter]]:
+        """
+        Get the route profile
+
+        Returns:
+            Tuple of (status, samples); samples is None until all requests are done
+        """
+        with self._lock:
+            return self._status(), self._result
+
+    def _status(self) -> Dict:
+        return {
+            'route': self._route,
+            'requested': self._requested,
+            'completed': self._completed,
+            'running': self.armed,
+            'ready': self._result is not None
+        }
@@ -0,0 +1,259 @@
+"""
+Traffic Replay
+Plays recorded traffic (HEROTOPIA_TRAFFIC_RECORD traces) against a running
+server, keeping the original timing at 1x or an accelerated speed, and
+reports per-route throughput, latency percentiles and error/429 rates
+
+Chat messages, histories and search terms are synthesized with the recorded
+sizes, since traces never contain the original text.
+
+Usage:
+    python replay.py traffic.jsonl --base-url http://localhost:5000 --speed 4 --concurrency 32
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+
+FILLER_WORDS = ("photosynthesis", "energy", "water", "cycle", "fraction", "planet", "history",
+                "language", "grammar", "equation", "cell", "light", "number", "map", "river")
+
+
+def filler_text(length: int) -> str:
+    """Text of about `length` characters"""
+    words = []
+    total = 0
+    index = 0
+    while total < length:
+        word = FILLER_WORDS[index % len(FILLER_WORDS)]
+        words.append(word)
+        total += len(word) + 1
+        index += 1
+    return ' '.join(words)[:length]
+
+
+def build_request(entry: Dict, base_url: str) -> Optional[Tuple[str, str, Optional[bytes]]]:
+    """
+    Turn a trace entry back into an HTTP request
+
+    Returns:
+        Tuple of (method, url, JSON body), or None if the entry cannot be replayed
+    """
+    route = entry.get('route')
+
+    if route == '/chat':
+        history_size = entry.get('history_size', 0)
+        per_message = entry.get('history_length', 0) // history_size if history_size else 0
+        body = {
+            'message': filler_text(max(1, entry.get('message_length', 1))),
+            'language': entry.get('language') or 'en',
+            'history': [
+                {'role': 'user' if i % 2 == 0 else 'assistant', 'content': filler_text(per_message)}
+                for i in range(history_size)
+            ]
+        }
+        return 'POST', f"{base_url}/chat", json.dumps(body).encode('utf-8')
+
+    if route == '/chat/batch':
+        count = max(1, entry.get('item_count', 1))
+        languages = entry.get('languages') or ['en']
+        history_size = entry.get('history_size', 0) // count
+        body = {
+            'items': [
+                {
+                    'message': filler_text(max(1, entry.get('message_length', count) // count)),
+                    'language': languages[i % len(languages)],
+                    'history': [
+                        {'role': 'user' if j % 2 == 0 else 'assistant', 'content': filler_text(80)}
+                        for j in range(history_size)
+                    ]
+                }
+                for i in range(count)
+            ]
+        }
+        return 'POST', f"{base_url}/chat/batch", json.dumps(body).encode('utf-8')
+
+    if route == '/library/search':
+        params = {'q': filler_text(max(1, entry.get('query_length', 1)))}
+        if entry.get('limit'):
+            params['limit'] = entry['limit']
+        return 'GET', f"{base_url}/library/search?{urlencode(params)}", None
+
+    if entry.get('path') and entry.get('method', 'GET') == 'GET':
+        url = base_url + urllib.request.quote(entry['path'])
+        if entry.get('page'):
+            url += f"?page={entry['page']}"
+        return 'GET', url, None
+
+    return None
+
+
+def send(method: str, url: str, body: Optional[bytes], timeout: float) -> Tuple[int, float]:
+    """
+    Send one request and read the whole response
+
+    Returns:
+        Tuple of (status code, or 0 on a connection error, seconds taken)
+    """
+    request = urllib.request.Request(url, data=body, method=method)
+    if body is not None:
+        request.add_header('Content-Type', 'application/json')
+
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            while response.read(64 * 1024):
+                pass
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - start
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def load_trace(path: str, routes: Optional[List[str]], limit: Optional[int]) -> List[Dict]:
+    """Read a trace file, oldest request first"""
+    entries = []
+    with open(path, encoding='utf-8') as trace:
+        for line in trace:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if routes and entry.get('route') not in routes:
+                continue
+            entries.append(entry)
+
+    entries.sort(key=lambda entry: entry.get('ts', 0))
+    return entries[:limit] if limit else entries
+
+
+def replay(entries: List[Dict], base_url: str, speed: float, concurrency: int, timeout: float) -> Dict:
+    """
+    Send the trace, keeping its original spacing divided by `speed`
+
+    Returns:
+        Per-route results: {route: {'latencies': [...], 'statuses': [...]}} plus timing info
+    """
+    results = defaultdict(lambda: {'latencies': [], 'statuses': []})
+    results_lock = threading.Lock()
+    lags = []
+
+    def run(due, route, method, url, body):
+        # Time spent waiting for a free worker means the replayer fell behind
+        lag = time.perf_counter() - due
+        status, seconds = send(method, url, body, timeout)
+        with results_lock:
+            lags.append(lag)
+            results[route]['latencies'].append(seconds)
+            results[route]['statuses'].append(status)
+
+    first_ts = entries[0].get('ts', 0)
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for entry in entries:
+            request = build_request(entry, base_url)
+            if request is None:
+                continue
+
+            due = start + (entry.get('ts', first_ts) - first_ts) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            pool.submit(run, due, entry['route'], *request)
+
+    return {
+        'routes': dict(results),
+        'elapsed': time.perf_counter() - start,
+        'max_lag': max(lags) if lags else 0.0
+    }
+
+
+def summarize(outcome: Dict) -> Dict:
+    """Per-route throughput, latency percentiles and error/429 rates"""
+    summary = {}
+    elapsed = outcome['elapsed'] or 1e-9
+
+    for route, data in sorted(outcome['routes'].items()):
+        statuses = data['statuses']
+        latencies = data['latencies']
+        count = len(statuses)
+        summary[route] = {
+            'requests': count,
+            'throughput': round(count / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+            'p90_ms': round(percentile(latencies, 0.90) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'error_rate': round(sum(1 for s in statuses if s == 0 or (s >= 400 and s != 429)) / count, 4),
+            'rate_limited_rate': round(sum(1 for s in statuses if s == 429) / count, 4)
+        }
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded Herotopia traffic")
+    parser.add_argument('trace', help="JSONL trace written with HEROTOPIA_TRAFFIC_RECORD")
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--speed', type=float, default=1.0, help="Replay speed (1 = original timing, 4 = four times faster)")
+    parser.add_argument('--concurrency', type=int, default=16, help="Most requests in flight at once")
+    parser.add_argument('--timeout', type=float, default=120, help="Seconds before a request counts as failed")
+    parser.add_argument('--route', action='append', help="Only replay these routes (repeatable)")
+    parser.add_argument('--limit', type=int, help="Replay at most this many requests")
+    parser.add_argument('--json', dest='json_output', help="Also write the report to this file")
+    args = parser.parse_args()
+
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+
+    entries = load_trace(args.trace, args.route, args.limit)
+    if not entries:
+        print("Nothing to replay")
+        return 1
+
+    span = entries[-1].get('ts', 0) - entries[0].get('ts', 0)
+    print(f"Replaying {len(entries)} requests spanning {span:.0f}s at {args.speed:g}x "
+          f"with up to {args.concurrency} in flight against {args.base_url}")
+
+    outcome = replay(entries, args.base_url.rstrip('/'), args.speed, args.concurrency, args.timeout)
+    summary = summarize(outcome)
+
+    print(f"\n{'route':<36} {'reqs':>6} {'req/s':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'errors':>7} {'429':>7}")
+    for route, row in summary.items():
+        print(f"{route:<36} {row['requests']:>6} {row['throughput']:>8.2f} {row['p50_ms']:>9.1f} "
+              f"{row['p90_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['error_rate']:>7.1%} {row['rate_limited_rate']:>7.1%}")
+
+    print(f"\nWall time {outcome['elapsed']:.1f}s; largest scheduling lag {outcome['max_lag'] * 1000:.0f} ms")
+    if outcome['max_lag'] > 1:
+        print("! The replayer fell behind the trace; results understate the offered load (raise --concurrency)")
+
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as report:
+            json.dump({'elapsed': outcome['elapsed'], 'max_lag': outcome['max_lag'], 'routes': summary}, report, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,449 @@
+"""
+Retrieval Module
+Chunks library documents and finds passages relevant to a chat message
+Used to ground chatbot answers in the curated course material
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import List, Dict
+from urllib.parse import quote
+
+try:
+    import numpy as np
+except ImportError:
+    # Retrieval is optional; the chatbot works without it
+    np = None
+
+from search_index import extract_text, normalize_text
+
+
+# Smallest useful piece of a passage shortened to fit the prompt budget
+MIN_PASSAGE_TOKENS = 40
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Conservatively estimate the number of model tokens in a text
+    ASCII text averages about 4 characters per token for the small chat
+    models we ship, but Arabic and other non-Latin scripts take 1-2 tokens
+    per character; those characters are counted as their UTF-8 bytes, the
+    most a byte-level tokenizer can split them into
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated token count
+    """
+    return int(_token_cost(text)) + 1
+
+
+def _token_cost(text: str) -> float:
+    """Fractional token estimate behind estimate_tokens(), summable across words"""
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    other_bytes = len(text.encode('utf-8')) - ascii_chars
+    return ascii_chars / 4 + other_bytes
+
+
+class LibraryRetriever:
+    """
+    Passage retrieval over library documents
+    Passages are embedded with signed feature hashing and searched with a
+    single matrix-vector product, so no embedding model or GPU is needed
+    """
+
+    TEXT_EXTENSIONS = {'txt', 'csv', 'docx', 'pdf'}
+
+    def __init__(self,
+                 library_path: Path,
+                 index_dir: Path,
+                 dim: int = 512,
+                 chunk_tokens: int = 180,
+                 chunk_overlap: int = 45):
+        """
+        Initialize the retriever and load any saved index
+
+        Args:
+            library_path: Path to the library folder
+            index_dir: Folder where the passage index is saved
+            dim: Embedding dimension
+            chunk_tokens: Estimated tokens per passage (sized by tokens, not words,
+                so Arabic passages fit the prompt budget as well as English ones)
+            chunk_overlap: Estimated tokens shared between consecutive passages
+        """
+        if np is None:
+            raise ImportError("numpy not installed. Install with: pip install numpy")
+
+        self.library_path = Path(library_path)
+        self.index_dir = Path(index_dir)
+        self.dim = dim
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+
+        # Per-file state: path -> {'mtime_ns', 'size', 'chunks', 'vectors'}
+        self._documents: Dict[str, Dict] = {}
+
+        # Flattened search state, rebuilt after the documents change
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._chunk_refs: List[tuple] = []
+        self._chunk_texts: List[str] = []
+
+        self._lock = threading.Lock()
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Embedding
+    # ------------------------------------------------------------------
+
+    def embed(self, text: str) -> 'np.ndarray':
+        """
+        Embed text as an L2-normalized hashed bag of words
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            Vector of length `dim`
+        """
+        vector = np.zeros(self.dim, dtype=np.float32)
+        tokens = re.findall(r'\w+', normalize_text(text))
+
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            if len(token) > 1:
+                counts[token] = counts.get(token, 0) + 1
+
+        for token, count in counts.items():
+            h = zlib.crc32(token.encode('utf-8'))
+            sign = 1.0 if h & 0x80000000 else -1.0
+            vector[h % self.dim] += sign * (1.0 + np.log(count))
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def _chunk(self, text: str) -> List[str]:
+        """Split text into overlapping word windows of about chunk_tokens estimated tokens"""
+        words = text.split()
+        # Each word is followed by a space in the joined chunk
+        costs = [_token_cost(word) + 0.25 for word in words]
+
+        chunks = []
+        start = 0
+        while start < len(words):
+            end = start + 1
+            total = costs[start]
+            while end < len(words) and total + costs[end] <= self.chunk_tokens:
+                total += costs[end]
+                end += 1
+            chunks.append(' '.join(words[start:end]))
+            if end >= len(words):
+                break
+
+            # Step back over up to chunk_overlap tokens, always moving forward
+            next_start = end
+            overlap = 0.0
+            while next_start - 1 > start and overlap + costs[next_start - 1] <= self.chunk_overlap:
+                next_start -= 1
+                overlap += costs[next_start]
+            start = next_start
+        return chunks
+
+    # ------------------------------------------------------------------
+    # Indexing
+    # ------------------------------------------------------------------
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        Bring the passage index up to date with the library folder
+        Only new, modified and deleted files are re-processed
+
+        Returns:
+            Counts of added, updated and removed documents
+        """
+        on_disk = {}
+        root = str(self.library_path)
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for filename in filenames:
+                if filename.startswith('.'):
+                    continue
+                if Path(filename).suffix.lower().lstrip('.') not in self.TEXT_EXTENSIONS:
+                    continue
+                full_path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(full_path)
+                except OSError:
+                    continue
+                rel_path = Path(os.path.relpath(full_path, root)).as_posix()
+                on_disk[rel_path] = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            known = dict(self._documents)
+
+        removed = [path for path in known if path not in on_disk]
+        changed = [
+            path for path, stat in on_disk.items()
+            if path not in known or (known[path]['mtime_ns'], known[path]['size']) != stat
+        ]
+
+        # Chunk and embed outside the lock so retrieval keeps serving
+        updates = {path: self._build_document(path, *on_disk[path]) for path in changed}
+
+        if removed or updates:
+            with self._lock:
+                for path in removed:
+                    self._documents.pop(path, None)
+                self._documents.update(updates)
+                self._rebuild()
+            self._save()
+
+        added = sum(1 for path in changed if path not in known)
+        return {
+            'added': added,
+            'updated': len(changed) - added,
+            'removed': len(removed)
+        }
+
+    def update_file(self, relative_path: str):
+        """
+        Index, re-index or drop a single file, e.g. right after it was added
+
+        Args:
+            relative_path: Path of the file within the library
+        """
+        rel_path = Path(relative_path).as_posix()
+        full_path = self.library_path / rel_path
+
+        document = None
+        if full_path.is_file() and full_path.suffix.lower().lstrip('.') in self.TEXT_EXTENSIONS:
+            stat = full_path.stat()
+            document = self._build_document(rel_path, stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            if document:
+                self._documents[rel_path] = document
+            else:
+                self._documents.pop(rel_path, None)
+            self._rebuild()
+        self._save()
+
+    def _build_document(self, rel_path: str, mtime_ns: int, size: int) -> Dict:
+        """Chunk and embed one library file"""
+        text = extract_text(str(self.library_path / rel_path))
+        chunks = self._chunk(text)
+
+        if chunks:
+            vectors = np.stack([self.embed(chunk) for chunk in chunks])
+        else:
+            vectors = np.zeros((0, self.dim), dtype=np.float32)
+
+        return {
+            'mtime_ns': mtime_ns,
+            'size': size,
+            'chunks': chunks,
+            'vectors': vectors
+        }
+
+    def _rebuild(self):
+        """
+        Rebuild the flattened search state (caller holds the lock)
+        New lists are assigned rather than updated, so retrievals holding the
+        previous ones keep a consistent view
+        """
+        refs = []
+        texts = []
+        blocks = []
+        for path, document in self._documents.items():
+            for i, chunk in enumerate(document['chunks']):
+                refs.append((path, i))
+                texts.append(chunk)
+            if len(document['chunks']):
+                blocks.append(document['vectors'])
+
+        self._chunk_refs = refs
+        self._chunk_texts = texts
+        self._matrix = np.concatenate(blocks) if blocks else np.zeros((0, self.dim), dtype=np.float32)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _save(self):
+        """Save the index so restarts only re-process changed files"""
+        with self._lock:
+            metadata = {
+                'dim': self.dim,
+                'chunk_tokens': self.chunk_tokens,
+                'chunk_overlap': self.chunk_overlap,
+                'documents': {
+                    path: {
+                        'mtime_ns': doc['mtime_ns'],
+                        'size': doc['size'],
+                        'chunks': doc['chunks']
+                    }
+                    for path, doc in self._documents.items()
+                }
+            }
+            matrix = self._matrix
+
+        try:
+            # Write to temporary files first so a crash never leaves a torn index
+            vectors_tmp = self.index_dir / 'vectors.tmp.npy'
+            metadata_tmp = self.index_dir / 'passages.tmp.json'
+            np.save(vectors_tmp, matrix)
+            metadata_tmp.write_text(json.dumps(metadata, ensure_ascii=False), encoding='utf-8')
+            os.replace(vectors_tmp, self.index_dir / 'vectors.npy')
+            os.replace(metadata_tmp, self.index_dir / 'passages.json')
+        except OSError as e:
+            print(f"Error saving retrieval index: {str(e)}")
+
+    def _load(self):
+        """Load a previously saved index if its settings still match"""
+        metadata_path = self.index_dir / 'passages.json'
+        vectors_path = self.index_dir / 'vectors.npy'
+        if not metadata_path.exists() or not vectors_path.exists():
+            return
+
+        try:
+            metadata = json.loads(metadata_path.read_text(encoding='utf-8'))
+            # Indexes chunked by word count (no 'chunk_tokens') are rebuilt too
+            if (metadata.get('dim'), metadata.get('chunk_tokens'), metadata.get('chunk_overlap')) != \
+                    (self.dim, self.chunk_tokens, self.chunk_overlap):
+                return
+
+            matrix = np.load(vectors_path)
+            offset = 0
+            for path, doc in metadata['documents'].items():
+                count = len(doc['chunks'])
+                self._documents[path] = {
+                    'mtime_ns': doc['mtime_ns'],
+                    'size': doc['size'],
+                    'chunks': doc['chunks'],
+                    'vectors': matrix[offset:offset + count]
+                }
+                offset += count
+
+            self._rebuild()
+        except Exception as e:
+            print(f"Error loading retrieval index, rebuilding: {str(e)}")
+            self._documents = {}
+            self._rebuild()
+
+    # ------------------------------------------------------------------
+    # Retrieval
+    # ------------------------------------------------------------------
+
+    def retrieve(self, query: str, top_k: int = 3, min_score: float = 0.1) -> List[Dict]:
+        """
+        Find the library passages most similar to a query
+
+        Args:
+            query: User message
+            top_k: Maximum number of passages
+            min_score: Minimum cosine similarity for a passage to be used
+
+        Returns:
+            List of passages with path, library URL, text and score
+        """
+        query_vector = self.embed(query)
+        if not query_vector.any():
+            return []
+
+        with self._lock:
+            matrix = self._matrix
+            refs = self._chunk_refs
+            texts = self._chunk_texts
+
+        if not refs:
+            return []
+
+        scores = matrix @ query_vector
+        k = min(top_k, len(refs))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        passages = []
+        for i in top:
+            score = float(scores[i])
+            if score < min_score:
+                break
+            path = refs[i][0]
+            passages.append({
+                'path': path,
+                'url': f"/library/{quote(path)}",
+                'text': texts[i],
+                'score': round(score, 4)
+            })
+
+        return passages
+
+    def start_background_refresh(self, interval: float):
+        """
+        Refresh the index now and then every `interval` seconds in a daemon thread
+
+        Args:
+            interval: Seconds between refreshes
+        """
+        def refresh_loop():
+            while True:
+                try:
+                    counts = self.refresh()
+                    if any(counts.values()):
+                        print(f"✓ Retrieval index updated: {counts}")
+                except Exception as e:
+                    print(f"Error refreshing retrieval index: {str(e)}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=refresh_loop, name='retrieval-refresh', daemon=True)
+        thread.start()
+
+
+def fit_passages(passages: List[Dict], token_budget: int) -> List[Dict]:
+    """
+    Keep the best passages that fit within a token budget
+    A passage that does not fit is shortened to the remaining budget when
+    at least MIN_PASSAGE_TOKENS remain, rather than dropped
+
+    Args:
+        passages: Passages ordered by relevance
+        token_budget: Maximum estimated tokens for all passage texts
+
+    Returns:
+        Passages that fit, in the same order
+    """
+    selected = []
+    used = 0
+    for passage in passages:
+        url_cost = estimate_tokens(passage['url'])
+        cost = estimate_tokens(passage['text']) + url_cost
+        if used + cost > token_budget:
+            remaining = token_budget - used - url_cost
+            if remaining < MIN_PASSAGE_TOKENS:
+                continue
+            passage = dict(passage, text=_trim_to_tokens(passage['text'], remaining))
+            cost = estimate_tokens(passage['text']) + url_cost
+        selected.append(passage)
+        used += cost
+    return selected
+
+
+def _trim_to_tokens(text: str, token_budget: int) -> str:
+    """Cut text after the last whole word that keeps it within a token budget"""
+    words = []
+    total = 1.0 + _token_cost('…')
+    for word in text.split():
+        total += _token_cost(word) + 0.25
+        if total > token_budget:
+            break
+        words.append(word)
+    return ' '.join(words) + '…'
@@ -0,0 +1,529 @@
+"""
+Search Index Module
+Full-text search over the digital library using an on-disk SQLite FTS5 index
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+from xml.etree import ElementTree
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    # PDF text extraction is optional; PDFs are still indexed by name and path
+    PdfReader = None
+
+
+# Arabic diacritics (harakat), superscript alef and tatweel
+ARABIC_MARKS = re.compile(r'[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]')
+
+# Arabic letter variants folded to a single form
+ARABIC_FOLDS = {
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+}
+
+# Runs of characters that may be combining accents after decomposition
+NON_ASCII_RUN = re.compile(r'[^\x00-\x7f]+')
+
+# Extracted text is capped per document to keep the index compact
+MAX_TEXT_CHARS = 200_000
+
+# Leading original text kept per document for snippets; only this part is
+# scanned for a match to show, so snippets cost the same for any document size
+SNIPPET_SOURCE_CHARS = 4000
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for indexing and querying
+    Folds case, French accents and Arabic letter variants
+
+    Args:
+        text: Raw text
+
+    Returns:
+        Normalized text
+    """
+    # Nothing below changes ASCII text except case folding
+    if text.isascii():
+        return text.lower()
+
+    # str.replace per fold is much faster than str.translate with a mapping
+    text = ARABIC_MARKS.sub('', text)
+    for variant, base in ARABIC_FOLDS.items():
+        text = text.replace(variant, base)
+
+    # Strip Latin combining accents (é -> e, ç -> c); ASCII is never combining
+    decomposed = unicodedata.normalize('NFKD', text)
+    text = NON_ASCII_RUN.sub(_strip_combining, decomposed)
+
+    return unicodedata.normalize('NFC', text).casefold()
+
+
+def _strip_combining(match) -> str:
+    """Drop combining characters from a run of non-ASCII characters"""
+    return ''.join(ch for ch in match.group() if not unicodedata.combining(ch))
+
+
+def _docx_text(path: Path) -> str:
+    """Extract paragraph text from a DOCX file using only the standard library"""
+    with zipfile.ZipFile(path) as archive:
+        xml_data = archive.read('word/document.xml')
+
+    namespace = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+    root = ElementTree.fromstring(xml_data)
+
+    paragraphs = []
+    for paragraph in root.iter(f'{namespace}p'):
+        runs = [node.text for node in paragraph.iter(f'{namespace}t') if node.text]
+        if runs:
+            paragraphs.append(''.join(runs))
+
+    return '\n'.join(paragraphs)
+
+
+def _pdf_text(path: Path) -> str:
+    """Extract text from a PDF file if pypdf is installed"""
+    if PdfReader is None:
+        return ""
+
+    reader = PdfReader(str(path))
+    pages = []
+    total = 0
+    for page in reader.pages:
+        page_text = page.extract_text() or ""
+        pages.append(page_text)
+        total += len(page_text)
+        if total >= MAX_TEXT_CHARS:
+            break
+
+    return '\n'.join(pages)
+
+
+def extract_text(path_str: str) -> str:
+    """
+    Extract searchable text content from a library file
+
+    Args:
+        path_str: Absolute path of the file
+
+    Returns:
+        Extracted text (empty for unsupported or unreadable files)
+    """
+    path = Path(path_str)
+    ext = path.suffix.lower().lstrip('.')
+
+    try:
+        if ext in ('txt', 'csv'):
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                return f.read(MAX_TEXT_CHARS)
+        if ext == 'docx':
+            return _docx_text(path)[:MAX_TEXT_CHARS]
+        if ext == 'pdf':
+            return _pdf_text(path)[:MAX_TEXT_CHARS]
+    except Exception as e:
+        print(f"Error extracting text from {path.name}: {str(e)}")
+
+    return ""
+
+
+# Per-character normalize_text results (the alphabet of the library is small)
+_FOLDED_CHARS: Dict[str, str] = {}
+
+
+def _normalize_with_offsets(text: str) -> Tuple[str, List[int]]:
+    """
+    Normalize text character by character, remembering where each
+    normalized character came from
+
+    Returns:
+        Tuple of (normalized text, original index of each normalized character)
+    """
+    if text.isascii():
+        return text.lower(), list(range(len(text)))
+
+    normalized = []
+    offsets = []
+    for index, ch in enumerate(text):
+        folded = _FOLDED_CHARS.get(ch)
+        if folded is None:
+            folded = _FOLDED_CHARS[ch] = normalize_text(ch)
+        for folded_ch in folded:
+            normalized.append(folded_ch)
+            offsets.append(index)
+    return ''.join(normalized), offsets
+
+
+def make_snippet(text: str, terms: List[str], words: int = 12) -> str:
+    """
+    Build a search snippet from the original (not normalized) text
+    Matching happens on normalized text, so accents and Arabic letters are
+    shown as written while matches are still found the way the index finds them
+
+    Args:
+        text: Original document text (the stored excerpt)
+        terms: Normalized query terms; the last one matches as a prefix
+        words: Number of words in the snippet
+
+    Returns:
+        Snippet with matches in [brackets] and '…' where text was cut
+    """
+    if not text:
+        return ""
+
+    alternatives = [re.escape(term) for term in terms[:-1]] + [re.escape(terms[-1]) + r'\w*'] if terms else []
+    pattern = re.compile(r'(?<!\w)(?:' + '|'.join(alternatives) + r')(?!\w)') if alternatives else None
+
+    # Find the first line with a match using cheap whole-line normalization,
+    # then map only that line back to original offsets; without a match
+    # (name or folder hits) the opening words are enough
+    text = text[:SNIPPET_SOURCE_CHARS]
+    segment_start, segment = 0, text[:words * 40]
+    if pattern:
+        for line in re.finditer(r'[^\n]+', text):
+            if pattern.search(normalize_text(line.group())):
+                segment_start, segment = line.start(), line.group()
+                break
+
+    normalized, offsets = _normalize_with_offsets(segment)
+    tokens = []
+    for token in re.finditer(r'\w+', normalized):
+        start = offsets[token.start()]
+        end = offsets[token.end() - 1] + 1
+        # Keep combining marks that were dropped at the end of the word
+        while end < len(segment) and not _FOLDED_CHARS.get(segment[end], 'x'):
+            end += 1
+        tokens.append((start, end, bool(pattern and pattern.fullmatch(token.group()))))
+
+    if not tokens:
+        return ""
+
+    first_match = next((i for i, token in enumerate(tokens) if token[2]), 0)
+    first = max(0, min(first_match - words // 2, len(tokens) - words))
+    window = tokens[first:first + words]
+
+    parts = []
+    position = window[0][0]
+    for start, end, matched in window:
+        parts.append(segment[position:start])
+        parts.append(f"[{segment[start:end]}]" if matched else segment[start:end])
+        position = end
+
+    snippet = ' '.join(''.join(parts).split())
+    if first > 0 or segment_start > 0:
+        snippet = '…' + snippet
+    if first + words < len(tokens) or segment_start + len(segment) < len(text):
+        snippet += '…'
+    return snippet
+
+
+class LibrarySearchIndex:
+    """
+    Inverted index over library file names, folder paths and text content
+    Backed by SQLite FTS5 (BM25 ranking, prefix queries) and updated incrementally
+    """
+
+    # File types whose content is extracted in addition to name and path
+    TEXT_EXTENSIONS = {'txt', 'csv', 'docx', 'pdf'}
+
+    def __init__(self, library_path: Path, index_path: Path, workers: Optional[int] = None):
+        """
+        Initialize the search index
+
+        Args:
+            library_path: Path to the library folder
+            index_path: Path of the SQLite index file
+            workers: Number of text extraction threads (defaults to CPU count, at most 4)
+        """
+        self.library_path = Path(library_path)
+        self.index_path = Path(index_path)
+        self.workers = workers or min(4, os.cpu_count() or 1)
+
+        # Serializes writers; readers use their own connections
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._create_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection to the index"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.index_path), timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        """Create the index tables if they don't exist"""
+        conn = self._connect()
+
+        # Indexes from before snippet excerpts were stored are rebuilt from scratch
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(documents)')]
+        if columns and 'excerpt' not in columns:
+            conn.executescript("""
+                DROP TABLE documents;
+                DROP TABLE IF EXISTS documents_fts;
+            """)
+
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                excerpt TEXT NOT NULL DEFAULT ''
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                name, folder, content,
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+        """)
+        conn.commit()
+
+    def _scan_files(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Walk the library and collect file stats
+
+        Returns:
+            Mapping of relative path -> (mtime_ns, size)
+        """
+        files = {}
+        root = str(self.library_path)
+
+        for dirpath, dirnames, filenames in os.walk(root):
+            # Skip hidden folders, matching LibraryManager
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+
+            for filename in filenames:
+                if filename.startswith('.'):
+                    continue
+
+                full_path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(full_path)
+                except OSError:
+                    continue
+
+                rel_path = Path(os.path.relpath(full_path, root)).as_posix()
+                files[rel_path] = (stat.st_mtime_ns, stat.st_size)
+
+        return files
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        Bring the index up to date with the library folder
+        Only new, modified and deleted files are touched
+
+        Returns:
+            Counts of added, updated and removed documents
+        """
+        with self._write_lock:
+            conn = self._connect()
+            on_disk = self._scan_files()
+            indexed = {
+                path: (doc_id, mtime_ns, size)
+                for doc_id, path, mtime_ns, size
+                in conn.execute('SELECT id, path, mtime_ns, size FROM documents')
+            }
+
+            removed = [path for path in indexed if path not in on_disk]
+            changed = [
+                path for path, stat in on_disk.items()
+                if path not in indexed or indexed[path][1:] != stat
+            ]
+
+            for path in removed:
+                self._delete(conn, indexed[path][0])
+
+            contents = self._extract_all(changed)
+
+            for path in changed:
+                if path in indexed:
+                    self._delete(conn, indexed[path][0])
+                mtime_ns, size = on_disk[path]
+                self._insert(conn, path, mtime_ns, size, contents.get(path, ""))
+
+            conn.commit()
+
+        added = sum(1 for path in changed if path not in indexed)
+        return {
+            'added': added,
+            'updated': len(changed) - added,
+            'removed': len(removed)
+        }
+
+    def update_file(self, relative_path: str):
+        """
+        Index or re-index a single file, e.g. right after it was added
+
+        Args:
+            relative_path: Path of the file within the library
+        """
+        full_path = self.library_path / relative_path
+        rel_path = Path(relative_path).as_posix()
+
+        with self._write_lock:
+            conn = self._connect()
+            row = conn.execute('SELECT id FROM documents WHERE path = ?', (rel_path,)).fetchone()
+            if row:
+                self._delete(conn, row[0])
+
+            if full_path.is_file():
+                stat = full_path.stat()
+                content = ""
+                if self._is_text_file(rel_path):
+                    content = extract_text(str(full_path))
+                self._insert(conn, rel_path, stat.st_mtime_ns, stat.st_size, content)
+
+            conn.commit()
+
+    def _is_text_file(self, rel_path: str) -> bool:
+        """Check whether the file's content should be extracted"""
+        return Path(rel_path).suffix.lower().lstrip('.') in self.TEXT_EXTENSIONS
+
+    def _extract_all(self, paths: List[str]) -> Dict[str, str]:
+        """
+        Extract the text of many files using a thread pool
+        (not processes: spawned workers would re-import app.py and load the model)
+
+        Args:
+            paths: Relative paths of files to extract
+
+        Returns:
+            Mapping of relative path -> extracted text
+        """
+        text_paths = [path for path in paths if self._is_text_file(path)]
+        if not text_paths:
+            return {}
+
+        full_paths = [str(self.library_path / path) for path in text_paths]
+
+        # A pool costs more than it saves for a handful of files
+        if len(text_paths) < 8 or self.workers == 1:
+            return {path: extract_text(full) for path, full in zip(text_paths, full_paths)}
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='search-extract') as pool:
+            results = pool.map(extract_text, full_paths)
+            return dict(zip(text_paths, results))
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, doc_id: int):
+        """Remove a document from both tables"""
+        conn.execute('DELETE FROM documents WHERE id = ?', (doc_id,))
+        conn.execute('DELETE FROM documents_fts WHERE rowid = ?', (doc_id,))
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, path: str, mtime_ns: int, size: int, content: str):
+        """Add a document to both tables (original excerpt for snippets, normalized text for matching)"""
+        cursor = conn.execute(
+            'INSERT INTO documents (path, mtime_ns, size, excerpt) VALUES (?, ?, ?, ?)',
+            (path, mtime_ns, size, content[:SNIPPET_SOURCE_CHARS])
+        )
+        folder, _, name = path.rpartition('/')
+        conn.execute(
+            'INSERT INTO documents_fts (rowid, name, folder, content) VALUES (?, ?, ?, ?)',
+            (cursor.lastrowid, normalize_text(name), normalize_text(folder.replace('/', ' ')), normalize_text(content))
+        )
+
+    @staticmethod
+    def _build_query(terms: List[str], any_term: bool = False) -> str:
+        """
+        Turn normalized query terms into an FTS5 query
+        The last term is treated as a prefix
+
+        Args:
+            terms: Normalized query terms
+            any_term: Match documents with any term instead of every term
+
+        Returns:
+            FTS5 MATCH expression (empty if there are no usable terms)
+        """
+        if not terms:
+            return ""
+
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += '*'
+        return (' OR ' if any_term else ' ').join(quoted)
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """
+        Search the library
+
+        Args:
+            query: Search string (the last word matches as a prefix)
+            limit: Maximum number of results
+
+        Returns:
+            List of matches ordered by BM25 relevance
+        """
+        terms = re.findall(r'\w+', normalize_text(query))
+        match = self._build_query(terms)
+        if not match:
+            return []
+
+        conn = self._connect()
+        # Column weights: name matches count most, then folder, then content
+        rows = conn.execute("""
+            SELECT d.id, d.path, d.size, bm25(documents_fts, 10.0, 4.0, 1.0) AS score, d.excerpt
+            FROM documents_fts
+            JOIN documents d ON d.id = documents_fts.rowid
+            WHERE documents_fts MATCH ?
+            ORDER BY score
+            LIMIT ?
+        """, (match, limit)).fetchall()
+
+        # Only results whose text matched are scanned for a match to highlight;
+        # name and folder hits show the opening words
+        body_matches = set()
+        if rows:
+            ids = [row[0] for row in rows]
+            body_matches = {rowid for rowid, in conn.execute(f"""
+                SELECT rowid FROM documents_fts
+                WHERE documents_fts MATCH ? AND rowid IN ({', '.join('?' * len(ids))})
+            """, (f"content : ({self._build_query(terms, any_term=True)})", *ids))}
+
+        results = []
+        for doc_id, path, size, score, excerpt in rows:
+            results.append({
+                'name': path.rpartition('/')[2],
+                'path': path,
+                'size': size,
+                'score': round(-score, 4),
+                'snippet': make_snippet(excerpt, terms if doc_id in body_matches else [])
+            })
+
+        return results
+
+    def start_background_refresh(self, interval: float):
+        """
+        Refresh the index now and then every `interval` seconds in a daemon thread
+
+        Args:
+            interval: Seconds between refreshes
+        """
+        def refresh_loop():
+            while True:
+                try:
+                    counts = self.refresh()
+                    if any(counts.values()):
+                        print(f"✓ Search index updated: {counts}")
+                except Exception as e:
+                    print(f"Error refreshing search index: {str(e)}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=refresh_loop, name='search-index-refresh', daemon=True)
+        thread.start()
@@ -6,12 +6,46 @@
 let libraryData = [];
 let libraryPath = [];
 
+// Library version the cached tree is at (from /library and /library/changes)
+let libraryVersion = null;
+let libraryEpoch = null;
+let librarySyncInProgress = false;
+
+// How often open tabs ask the server for library changes
+const LIBRARY_SYNC_INTERVAL = 30000;
+
+// Folders with at least this many items are rendered as a virtualized grid
+const LIBRARY_VIRTUALIZE_THRESHOLD = 200;
+const LIBRARY_OVERSCAN_ROWS = 3;
+
+// Rendering state of the current folder
+const libraryView = {
+    items: [],              // Items of the current folder
+    visible: [],            // Items left after filtering
+    elements: new WeakMap(),  // Item -> element, so scrolling reuses nodes
+    grid: null,
+    columns: 1,
+    rowHeight: 1,
+    renderedStart: -1,
+    renderedEnd: -1,
+    needsMeasure: false
+};
+
 /**
  * Load library structure from server
  */
 async function loadLibrary() {
     const libraryContent = document.getElementById('library-content');
     
+    // Already cached: show it right away and only fetch what changed
+    if (libraryVersion !== null) {
+        libraryPath = [];
+        updateLibraryBreadcrumb();
+        displayLibrary(libraryData);
+        syncLibraryChanges();
+        return;
+    }
+    
     // Show loading
     libraryContent.innerHTML = `
         <div class="col-12 text-center py-5">
@@ -26,7 +60,7 @@ async function loadLibrary() {
         const response = await apiRequest('/library', null, 'GET');
         
         if (response.success) {
-            libraryData = response.items;
+            setLibraryData(response);
             displayLibrary(libraryData);
         } else {
             libraryContent.innerHTML = `
@@ -49,14 +83,160 @@ async function loadLibrary() {
     }
 }
 
+/**
+ * Store a full library tree response
+ * @param {Object} response - /library response
+ */
+function setLibraryData(response) {
+    libraryData = response.items;
+    libraryVersion = response.version !== undefined ? response.version : null;
+    libraryEpoch = response.epoch || null;
+}
+
+/**
+ * Fetch library changes since the cached version and apply them
+ * Falls back to reloading the whole tree when the server asks for it
+ */
+async function syncLibraryChanges() {
+    if (libraryVersion === null || librarySyncInProgress) {
+        return;
+    }
+    
+    librarySyncInProgress = true;
+    try {
+        const query = `since=${libraryVersion}&epoch=${encodeURIComponent(libraryEpoch || '')}`;
+        const response = await apiRequest(`/library/changes?${query}`, null, 'GET');
+        
+        if (!response.success) {
+            return;
+        }
+        
+        if (response.reset) {
+            const full = await apiRequest('/library', null, 'GET');
+            if (full.success) {
+                setLibraryData(full);
+                refreshLibraryView();
+            }
+            return;
+        }
+        
+        response.changes.forEach(applyLibraryChange);
+        libraryVersion = response.version;
+        libraryEpoch = response.epoch;
+        
+        if (response.changes.length > 0) {
+            refreshLibraryView();
+        }
+    } catch (error) {
+        console.warn('Library sync failed:', error);
+    } finally {
+        librarySyncInProgress = false;
+    }
+}
+
+/**
+ * Poll for library changes while the page is visible
+ */
+function startLibrarySync() {
+    setInterval(() => {
+        if (document.visibilityState === 'visible') {
+            syncLibraryChanges();
+        }
+    }, LIBRARY_SYNC_INTERVAL);
+    
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'visible') {
+            syncLibraryChanges();
+        }
+    });
+}
+
+/**
+ * Apply one added/removed/modified change to the cached tree
+ * Changes are idempotent, so replaying one the tree already has is harmless
+ * @param {Object} change - Change from /library/changes
+ */
+function applyLibraryChange(change) {
+    const parts = change.path.split('/');
+    const name = parts.pop();
+    const siblings = getLibraryFolderItems(parts.join('/'));
+    
+    if (!siblings) {
+        return;
+    }
+    
+    const index = siblings.findIndex(item => item.name === name);
+    
+    if (change.op === 'removed') {
+        if (index !== -1) {
+            siblings.splice(index, 1);
+        }
+        return;
+    }
+    
+    const item = { ...change.item };
+    if (item.type === 'folder') {
+        item.children = index !== -1 && siblings[index].children ? siblings[index].children : [];
+    }
+    
+    if (index !== -1) {
+        siblings.splice(index, 1);
+    }
+    
+    // Keep the server's order: folders first, then by name
+    const sortKey = entry => `${entry.type === 'folder' ? 0 : 1}${entry.name.toLowerCase()}`;
+    const key = sortKey(item);
+    const position = siblings.findIndex(entry => sortKey(entry) > key);
+    siblings.splice(position === -1 ? siblings.length : position, 0, item);
+}
+
+/**
+ * Get the cached item list of a folder
+ * @param {string} path - Folder path ('' for the library root)
+ * @returns {Array|null} Folder items, or null if the folder is unknown
+ */
+function getLibraryFolderItems(path) {
+    let currentData = libraryData;
+    const pathParts = path ? path.split('/') : [];
+    
+    for (const part of pathParts) {
+        const folder = currentData.find(item => item.name === part && item.type === 'folder');
+        if (!folder) {
+            return null;
+        }
+        folder.children = folder.children || [];
+        currentData = folder.children;
+    }
+    
+    return currentData;
+}
+
+/**
+ * Re-render the folder the user is looking at after the tree changed
+ */
+function refreshLibraryView() {
+    if (appState.currentSection !== 'library') {
+        return;
+    }
+    
+    const path = libraryPath.length > 0 ? libraryPath[libraryPath.length - 1].path : '';
+    displayLibrary(getLibraryFolderItems(path) || []);
+}
+
 /**
  * Display library items
+ * Small folders are rendered in full; large folders are virtualized so
+ * only the rows near the viewport have DOM nodes
  * @param {Array} items - Library items to display
  */
 function displayLibrary(items) {
     const libraryContent = document.getElementById('library-content');
     
     if (!items || items.length === 0) {
+        libraryView.items = [];
+        libraryView.visible = [];
+        libraryContent.className = '';
+        libraryContent.style.height = '';
         libraryContent.innerHTML = `
             <div class="col-12 text-center">
                 <div class="empty-library">
@@ -69,14 +249,160 @@ function displayLibrary(items) {
         return;
     }
     
-    // Create grid
-    libraryContent.className = 'library-grid';
-    libraryContent.innerHTML = '';
-    
+    // Precompute search keys once per item so filtering is a plain scan
     items.forEach(item => {
-        const itemElement = createLibraryItemElement(item);
-        libraryContent.appendChild(itemElement);
+        if (item.searchKey === undefined) {
+            item.searchKey = item.name.toLowerCase();
+        }
     });
+    
+    libraryView.items = items;
+    
+    const librarySearch = document.getElementById('library-search');
+    applyLibraryFilter(librarySearch ? librarySearch.value : '');
+}
+
+/**
+ * Filter the current folder and render the result
+ * @param {string} searchTerm - Search term
+ */
+function applyLibraryFilter(searchTerm) {
+    const lowerSearchTerm = (searchTerm || '').trim().toLowerCase();
+    
+    libraryView.visible = lowerSearchTerm
+        ? libraryView.items.filter(item => item.searchKey.includes(lowerSearchTerm))
+        : libraryView.items;
+    
+    renderLibraryItems();
+}
+
+/**
+ * Render the filtered items, virtualizing large lists
+ */
+function renderLibraryItems() {
+    const libraryContent = document.getElementById('library-content');
+    const items = libraryView.visible;
+    
+    libraryView.renderedStart = -1;
+    libraryView.renderedEnd = -1;
+    
+    if (items.length === 0) {
+        libraryContent.className = '';
+        libraryContent.style.height = '';
+        libraryContent.innerHTML = `
+            <div class="col-12 text-center py-5">
+                <p>No items match your search.</p>
+            </div>
+        `;
+        return;
+    }
+    
+    if (items.length < LIBRARY_VIRTUALIZE_THRESHOLD) {
+        // Create grid
+        libraryContent.className = 'library-grid';
+        libraryContent.style.height = '';
+        libraryContent.replaceChildren(...items.map(getLibraryItemElement));
+        return;
+    }
+    
+    // Virtualized grid: a sized container with one translated grid window inside
+    libraryContent.className = 'library-virtual';
+    libraryContent.innerHTML = '<div class="library-grid"></div>';
+    libraryView.grid = libraryContent.firstElementChild;
+    
+    measureLibraryLayout();
+    renderLibraryWindow();
+}
+
+/**
+ * Measure columns and row height of the virtualized grid
+ */
+function measureLibraryLayout() {
+    const libraryContent = document.getElementById('library-content');
+    const grid = libraryView.grid;
+    
+    // Render one item to measure the fixed card height and grid columns
+    grid.replaceChildren(getLibraryItemElement(libraryView.visible[0]));
+    const style = getComputedStyle(grid);
+    const gap = parseFloat(style.rowGap) || 0;
+    
+    libraryView.columns = Math.max(1, style.gridTemplateColumns.split(' ').filter(Boolean).length);
+    libraryView.rowHeight = grid.firstElementChild.offsetHeight + gap;
+    
+    const rows = Math.ceil(libraryView.visible.length / libraryView.columns);
+    libraryContent.style.height = `${rows * libraryView.rowHeight}px`;
+    libraryView.renderedStart = -1;
+    libraryView.renderedEnd = -1;
+}
+
+/**
+ * Render only the rows of the virtualized grid that are near the viewport
+ */
+function renderLibraryWindow() {
+    const libraryContent = document.getElementById('library-content');
+    if (libraryContent.className !== 'library-virtual' || !libraryView.grid) {
+        return;
+    }
+    
+    const { columns, rowHeight, visible } = libraryView;
+    const top = libraryContent.getBoundingClientRect().top;
+    const totalRows = Math.ceil(visible.length / columns);
+    
+    const firstRow = Math.max(0, Math.floor(-top / rowHeight) - LIBRARY_OVERSCAN_ROWS);
+    const lastRow = Math.min(totalRows, Math.ceil((window.innerHeight - top) / rowHeight) + LIBRARY_OVERSCAN_ROWS);
+    
+    const start = firstRow * columns;
+    const end = Math.min(visible.length, Math.max(lastRow, firstRow) * columns);
+    
+    if (start === libraryView.renderedStart && end === libraryView.renderedEnd) {
+        return;
+    }
+    
+    libraryView.renderedStart = start;
+    libraryView.renderedEnd = end;
+    libraryView.grid.style.transform = `translateY(${firstRow * rowHeight}px)`;
+    libraryView.grid.replaceChildren(...visible.slice(start, end).map(getLibraryItemElement));
+}
+
+/**
+ * Get the element of a library item, reusing it if it was built before
+ * @param {Object} item - Library item data
+ * @returns {HTMLElement} Item element
+ */
+function getLibraryItemElement(item) {
+    let element = libraryView.elements.get(item);
+    if (!element) {
+        element = createLibraryItemElement(item);
+        libraryView.elements.set(item, element);
+    }
+    return element;
+}
+
+/**
+ * Keep the virtualized window in sync with scrolling and resizing
+ */
+function setupLibraryVirtualization() {
+    let framePending = false;
+    const scheduleRender = (remeasure) => {
+        if (remeasure) {
+            libraryView.needsMeasure = true;
+        }
+        if (framePending) {
+            return;
+        }
+        framePending = true;
+        requestAnimationFrame(() => {
+            framePending = false;
+            if (libraryView.needsMeasure && libraryView.grid && libraryView.visible.length >= LIBRARY_VIRTUALIZE_THRESHOLD) {
+                libraryView.needsMeasure = false;
+                measureLibraryLayout();
+            }
+            renderLibraryWindow();
+        });
+    };
+    
+    window.addEventListener('scroll', () => scheduleRender(false), { passive: true });
+    window.addEventListener('resize', () => scheduleRender(true));
 }
 
 /**
@@ -111,12 +437,13 @@ function createLibraryItemElement(item) {
         itemDiv.style.cursor = 'pointer';
         
         itemDiv.innerHTML = `
-            <span class="library-item-icon">${item.icon}</span>
+            ${createLibraryItemPreview(item)}
             <div class="library-item-name">${escapeHtml(item.name)}</div>
             <div class="library-item-category">${item.category}</div>
             <span class="file-type-badge">${fileExtension}</span>
             <div class="library-item-size">${fileSize}</div>
         `;
+        attachThumbnailFallback(itemDiv, item);
     }
     
     // Right-click context menu
@@ -128,6 +455,45 @@ function createLibraryItemElement(item) {
     return itemDiv;
 }
 
+// File types the server can thumbnail (thumbnails.py IMAGE_EXTENSIONS and VIDEO_EXTENSIONS)
+const THUMBNAIL_EXTENSIONS = new Set(['jpg', 'jpeg', 'png', 'gif', 'webp', 'bmp', 'mp4', 'webm', 'mkv', 'avi']);
+
+/**
+ * Build the preview markup for a file item
+ * Images and videos get a lazily loaded server-side thumbnail that falls
+ * back to the file type icon if no thumbnail can be generated
+ * @param {Object} item - Library item data
+ * @returns {string} Preview HTML
+ */
+function createLibraryItemPreview(item) {
+    const extension = item.name.includes('.') ? item.name.split('.').pop().toLowerCase() : '';
+    if (!THUMBNAIL_EXTENSIONS.has(extension)) {
+        return `<span class="library-item-icon">${item.icon}</span>`;
+    }
+    
+    const thumbUrl = `/library/thumb/${item.path.split('/').map(encodeURIComponent).join('/')}?v=${item.modified || 0}`;
+    return `<img class="library-item-thumb" src="${thumbUrl}" alt="" loading="lazy" decoding="async">`;
+}
+
+/**
+ * Swap a failed thumbnail for the file type icon
+ * @param {HTMLElement} itemDiv - Library item element
+ * @param {Object} item - Library item data
+ */
+function attachThumbnailFallback(itemDiv, item) {
+    const thumb = itemDiv.querySelector('.library-item-thumb');
+    if (!thumb) {
+        return;
+    }
+    
+    thumb.addEventListener('error', () => {
+        const icon = document.createElement('span');
+        icon.className = 'library-item-icon';
+        icon.textContent = item.icon;
+        thumb.replaceWith(icon);
+    }, { once: true });
+}
+
 /**
  * Navigate to a folder
  * @param {string} path - Folder path
@@ -233,6 +599,9 @@ function openLibraryFile(path, name) {
     } else if (['mp4', 'webm', 'avi', 'mkv'].includes(fileExtension)) {
         // Play video
         showVideoPlayer(filePath, name);
+    } else if (['docx', 'pptx', 'xlsx', 'csv'].includes(fileExtension)) {
+        // Lightweight server-side preview instead of a full download
+        showDocumentPreview(path, name);
     } else {
         // Generic download
         downloadFile(filePath, name);
@@ -306,6 +675,84 @@ function showVideoPlayer(src, name) {
     modal.addEventListener('hidden.bs.modal', () => modal.remove());
 }
 
+/**
+ * Show a paginated document preview in a modal
+ * @param {string} path - File path within the library
+ * @param {string} name - File name
+ */
+function showDocumentPreview(path, name) {
+    const encodedPath = path.split('/').map(encodeURIComponent).join('/');
+    const modal = document.createElement('div');
+    modal.className = 'modal fade';
+    modal.id = `preview-modal-${Date.now()}`;
+    modal.innerHTML = `
+        <div class="modal-dialog modal-xl modal-dialog-centered modal-dialog-scrollable">
+            <div class="modal-content">
+                <div class="modal-header">
+                    <h5 class="modal-title">${escapeHtml(name)}</h5>
+                    <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
+                </div>
+                <div class="modal-body document-preview"></div>
+                <div class="modal-footer">
+                    <button type="button" class="btn btn-outline-secondary preview-prev">◀</button>
+                    <span class="preview-page"></span>
+                    <button type="button" class="btn btn-outline-secondary preview-next">▶</button>
+                    <a href="/library/${encodedPath}" download class="btn btn-primary">📥 Download</a>
+                </div>
+            </div>
+        </div>
+    `;
+    
+    document.body.appendChild(modal);
+    const body = modal.querySelector('.document-preview');
+    const pageLabel = modal.querySelector('.preview-page');
+    const prevButton = modal.querySelector('.preview-prev');
+    const nextButton = modal.querySelector('.preview-next');
+    let currentPage = 1;
+    
+    async function loadPage(page) {
+        body.innerHTML = `
+            <div class="text-center py-5">
+                <div class="spinner-border text-primary" role="status">
+                    <span class="visually-hidden">Loading...</span>
+                </div>
+            </div>
+        `;
+        try {
+            // Read the body on errors too: a 422 explains why the document has no preview
+            const response = await fetch(`/library/preview/${encodedPath}?page=${page}`)
+                .then(res => res.json());
+            if (!response.success) {
+                throw new Error(response.error);
+            }
+            
+            currentPage = response.page;
+            body.innerHTML = response.html || '<p class="text-muted">This document has no previewable text.</p>';
+            if (response.truncated && response.page === response.pages) {
+                body.insertAdjacentHTML('beforeend', '<p class="text-muted">… Download the file to see the rest.</p>');
+            }
+            pageLabel.textContent = `${response.page} / ${Math.max(response.pages, 1)}`;
+            prevButton.disabled = response.page <= 1;
+            nextButton.disabled = response.page >= response.pages;
+        } catch (error) {
+            body.innerHTML = `
+                <div class="alert alert-warning">
+                    <strong>⚠️ Preview unavailable:</strong> ${escapeHtml(error.message)}
+                </div>
+            `;
+        }
+    }
+    
+    prevButton.addEventListener('click', () => loadPage(currentPage - 1));
+    nextButton.addEventListener('click', () => loadPage(currentPage + 1));
+    
+    const bsModal = new bootstrap.Modal(modal);
+    bsModal.show();
+    loadPage(1);
+    
+    modal.addEventListener('hidden.bs.modal', () => modal.remove());
+}
+
 /**
  * Download file
  * @param {string} src - File source
@@ -324,20 +771,11 @@ function downloadFile(src, name) {
 
 /**
  * Filter library items by search term
+ * Filters the data of the current folder rather than scanning the DOM
  * @param {string} searchTerm - Search term
  */
 function filterLibraryItems(searchTerm) {
-    const items = document.querySelectorAll('.library-item');
-    const lowerSearchTerm = searchTerm.toLowerCase();
-    
-    items.forEach(item => {
-        const name = item.dataset.name;
-        if (name.includes(lowerSearchTerm)) {
-            item.style.display = '';
-        } else {
-            item.style.display = 'none';
-        }
-    });
+    applyLibraryFilter(searchTerm);
 }
 
 /**
@@ -374,6 +812,14 @@ function showLibraryContextMenu(event, item) {
                 📥 Download
             </a>
         `;
+    } else {
+        menuHTML += `
+            <a href="/library/archive/${item.path.split('/').map(encodeURIComponent).join('/')}" download
+               style="display:block; padding:8px 12px; color:#000; text-decoration:none; cursor:pointer;" 
+               onclick="this.closest('.context-menu').remove();">
+                🗜️ Download as ZIP
+            </a>
+        `;
     }
     
     menuHTML += `
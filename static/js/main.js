@@ -36,6 +36,9 @@ window.addEventListener('load', () => {
     // Set up navigation
     setupNavigation();
     
+    // Render large library folders as a virtualized grid
+    setupLibraryVirtualization();
+    
     // Pre-load library structure (but don't display until user clicks)
     // This improves perceived performance
     setupLibraryPreload();
@@ -83,13 +86,16 @@ function setupLibraryPreload() {
     apiRequest('/library', null, 'GET')
         .then(response => {
             if (response.success) {
-                libraryData = response.items;
+                setLibraryData(response);
                 console.log('✓ Library pre-loaded');
             }
         })
         .catch(error => {
             console.warn('Library pre-load failed:', error);
         });
+    
+    // Keep the cached tree current by fetching only changes
+    startLibrarySync();
 }
 
 /**
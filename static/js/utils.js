@@ -64,9 +64,10 @@ function initializeEventListeners() {
     // Library search
     const librarySearch = document.getElementById('library-search');
     if (librarySearch) {
-        librarySearch.addEventListener('input', (e) => {
+        // Debounced so fast typing filters once, not on every keystroke
+        librarySearch.addEventListener('input', debounce((e) => {
             filterLibraryItems(e.target.value);
-        });
+        }, 150));
     }
 }
 
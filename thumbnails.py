@@ -0,0 +1,211 @@
+"""
+Thumbnails Module
+Generates downscaled image thumbnails and video poster frames in a
+background worker pool, backed by a content-addressed disk cache
+"""
+
+import io
+import shutil
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    from PIL import Image, UnidentifiedImageError
+except ImportError:
+    # Image thumbnails are optional; the library falls back to file type icons
+    Image = None
+    UnidentifiedImageError = None
+
+from disk_cache import DiskCache
+
+
+class ThumbnailError(Exception):
+    """File whose thumbnail cannot be generated; remembered until the file changes"""
+
+
+# Failures that will repeat for the same bytes; timeouts and I/O errors are retried
+DECODE_ERRORS = (ThumbnailError,) + ((UnidentifiedImageError,) if UnidentifiedImageError else ())
+
+
+class ThumbnailGenerator:
+    """
+    Produces small JPEG previews for library images and videos
+    Work runs in a thread pool (Pillow and ffmpeg release the GIL) and
+    concurrent requests for the same thumbnail share a single job
+    """
+
+    IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'webp', 'bmp'}
+    VIDEO_EXTENSIONS = {'mp4', 'webm', 'mkv', 'avi'}
+
+    def __init__(self,
+                 cache: DiskCache,
+                 size: int = 256,
+                 quality: int = 80,
+                 workers: int = 2,
+                 ffmpeg_path: Optional[str] = None):
+        """
+        Initialize the generator
+
+        Args:
+            cache: Disk cache for generated thumbnails
+            size: Longest edge of a thumbnail in pixels
+            quality: JPEG quality
+            workers: Number of background worker threads
+            ffmpeg_path: ffmpeg executable for video poster frames (auto-detected)
+        """
+        self.cache = cache
+        self.size = size
+        self.quality = quality
+        self.ffmpeg_path = ffmpeg_path or shutil.which('ffmpeg')
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail')
+        self._pending: Dict[str, Future] = {}
+        self._pending_lock = threading.Lock()
+
+    def supports(self, source: Path) -> bool:
+        """
+        Check whether a thumbnail can be generated for a file
+
+        Args:
+            source: Library file
+
+        Returns:
+            True if the file type and installed tools allow it
+        """
+        ext = source.suffix.lower().lstrip('.')
+        if ext in self.IMAGE_EXTENSIONS:
+            return Image is not None
+        if ext in self.VIDEO_EXTENSIONS:
+            return self.ffmpeg_path is not None
+        return False
+
+    def cache_key(self, source: Path) -> str:
+        """Key a thumbnail by source content and output settings"""
+        return f"{self.cache.fingerprint(source)[:40]}-{self.size}"
+
+    def get(self, source: Path, timeout: float) -> Optional[Path]:
+        """
+        Get the cached thumbnail for a file, generating it if needed
+
+        Args:
+            source: Library file
+            timeout: Seconds to wait for generation before giving up
+
+        Returns:
+            Path of the thumbnail, or None if it is not ready in time
+
+        Raises:
+            ThumbnailError: If generation failed for this version of the file
+        """
+        key = self.cache_key(source)
+
+        cached = self.cache.get(key, '.jpg')
+        if cached:
+            return cached
+
+        failed = self.cache.get(key, '.failed')
+        if failed:
+            raise ThumbnailError(failed.read_text(encoding='utf-8', errors='replace'))
+
+        future = self.submit(source, key)
+        try:
+            return future.result(timeout=timeout)
+        except Exception as e:
+            # Still running jobs are cached when they finish
+            if not future.done():
+                return None
+            print(f"Error generating thumbnail for {source.name}: {str(e)}")
+            raise ThumbnailError(str(e)) from e
+
+    def submit(self, source: Path, key: Optional[str] = None) -> Future:
+        """
+        Queue thumbnail generation for a file, e.g. to warm the cache
+
+        Args:
+            source: Library file
+            key: Precomputed cache key (optional)
+
+        Returns:
+            Future resolving to the thumbnail path
+        """
+        key = key or self.cache_key(source)
+
+        with self._pending_lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pool.submit(self._generate, source, key)
+                self._pending[key] = future
+                future.add_done_callback(lambda _: self._forget(key))
+
+        return future
+
+    def _forget(self, key: str):
+        """Drop a finished job from the in-flight table"""
+        with self._pending_lock:
+            self._pending.pop(key, None)
+
+    def _generate(self, source: Path, key: str) -> Path:
+        """Render a thumbnail and store it (or a failure marker) in the cache"""
+        ext = source.suffix.lower().lstrip('.')
+
+        try:
+            if ext in self.VIDEO_EXTENSIONS:
+                data = self._video_poster(source)
+            else:
+                with open(source, 'rb') as f:
+                    data = self._downscale(f)
+        except DECODE_ERRORS as e:
+            # Keyed by content, so a fixed file gets a fresh attempt
+            self.cache.put(key, '.failed', str(e).encode('utf-8'))
+            raise
+
+        return self.cache.put(key, '.jpg', data)
+
+    def _downscale(self, image_file) -> bytes:
+        """Downscale an image file object to a JPEG thumbnail"""
+        with Image.open(image_file) as image:
+            # Let the JPEG decoder skip detail we would discard anyway
+            image.draft('RGB', (self.size * 2, self.size * 2))
+            image.thumbnail((self.size, self.size))
+
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.split()[-1])
+                image = background
+
+            output = io.BytesIO()
+            image.save(output, 'JPEG', quality=self.quality, optimize=True)
+            return output.getvalue()
+
+    def _video_poster(self, source: Path) -> bytes:
+        """Grab a poster frame from a video with ffmpeg"""
+        command = [
+            self.ffmpeg_path,
+            '-hide_banner', '-loglevel', 'error',
+            '-ss', '1',
+            '-i', str(source),
+            '-frames:v', '1',
+            '-vf', f"scale='min({self.size},iw)':-2",
+            '-f', 'image2', '-c:v', 'mjpeg',
+            '-q:v', '5',
+            'pipe:1'
+        ]
+        result = subprocess.run(command, capture_output=True, timeout=60)
+
+        if result.returncode != 0 or not result.stdout:
+            # Very short clips have no frame at 1s; retry from the start
+            command[command.index('-ss') + 1] = '0'
+            result = subprocess.run(command, capture_output=True, timeout=60)
+
+        if result.returncode != 0 or not result.stdout:
+            raise ThumbnailError(f"ffmpeg failed: {result.stderr.decode(errors='ignore').strip()}")
+
+        if Image is None:
+            return result.stdout
+
+        # Re-encode through Pillow so posters match image thumbnails
+        return self._downscale(io.BytesIO(result.stdout))
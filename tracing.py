@@ -0,0 +1,175 @@
+"""
+Tracing Module
+Per-request phase timings, reported as Server-Timing headers and written
+to a structured slow-request log
+
+Phases are recorded against the trace of the current request (a context
+variable), so code outside Flask can add phases without knowing about
+requests; with no active trace, recording is a no-op.
+"""
+
+import json
+import logging
+import logging.handlers
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+_current_trace: ContextVar = ContextVar('request_trace', default=None)
+
+
+class RequestTrace:
+    """
+    Durations of the named phases of one request
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+
+    def add(self, name: str, seconds: float):
+        """Record a phase that took `seconds`"""
+        self.phases.append((name, seconds))
+
+    def elapsed(self) -> float:
+        """Seconds since the request started"""
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """
+        Render the phases as a Server-Timing header value
+
+        Returns:
+            e.g. 'parse;dur=0.4, generate;dur=812.0, total;dur=815.2'
+        """
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases]
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ', '.join(entries)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Phase durations in milliseconds (repeated phases are summed)"""
+        phases: Dict[str, float] = {}
+        for name, seconds in self.phases:
+            phases[name] = round(phases.get(name, 0.0) + seconds * 1000, 1)
+        return phases
+
+
+def begin_trace() -> RequestTrace:
+    """
+    Start tracing the current request
+
+    Returns:
+        The new trace
+    """
+    trace = RequestTrace()
+    _current_trace.set(trace)
+    return trace
+
+
+def end_trace() -> Optional[RequestTrace]:
+    """
+    Stop tracing the current request
+
+    Returns:
+        The finished trace, or None if the request was not traced
+    """
+    trace = _current_trace.get()
+    _current_trace.set(None)
+    return trace
+
+
+def current_trace() -> Optional[RequestTrace]:
+    """Get the trace of the current request, if it is being traced"""
+    return _current_trace.get()
+
+
+def record_phase(name: str, seconds: float):
+    """
+    Record an already measured phase on the current trace
+
+    Args:
+        name: Phase name (letters, digits, '-' and '_')
+        seconds: Phase duration
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+@contextmanager
+def trace_phase(name: str):
+    """
+    Time a block as a phase of the current request
+
+    Args:
+        name: Phase name (letters, digits, '-' and '_')
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - start)
+
+
+class SlowRequestLog:
+    """
+    Writes requests slower than a threshold as JSON lines to a rotating file
+    """
+
+    def __init__(self, path: Path, threshold: float, max_bytes: int = 10 * 1024 * 1024, backups: int = 3):
+        """
+        Initialize the slow-request log
+
+        Args:
+            path: Log file path
+            threshold: Requests taking at least this many seconds are logged
+            max_bytes: Size at which the file is rotated
+            backups: Number of rotated files kept
+        """
+        self.threshold = threshold
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+
+        self._logger = logging.getLogger(f"herotopia.slow_requests.{path}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._logger.handlers = [handler]
+
+    def record(self, duration: float, trace: Optional[RequestTrace] = None, **fields) -> bool:
+        """
+        Log a finished request if it was slow
+        Every request is timed, so slow requests are logged whether or not
+        they were sampled for tracing; only traced ones include phases
+
+        Args:
+            duration: Seconds the request took
+            trace: Finished request trace, if the request was sampled
+            fields: Extra fields (route, method, status, ...)
+
+        Returns:
+            True if the request was logged
+        """
+        if duration < self.threshold:
+            return False
+
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'duration_ms': round(duration * 1000, 1),
+            **fields
+        }
+        if trace is not None:
+            entry['phases'] = trace.as_dict()
+        self._logger.info(json.dumps(entry, ensure_ascii=False))
+        return True
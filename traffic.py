@@ -0,0 +1,109 @@
+"""
+Traffic Module
+Opt-in recording of anonymized request traces for load replay (see replay.py)
+
+Only the shape of each request is kept: route, timing, language, message
+and history sizes. Message text, search terms, client addresses and headers
+are never written.
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# Routes that are never recorded (staff tools and monitoring)
+EXCLUDED_PREFIXES = ('/admin', '/metrics', '/library/uploads')
+
+
+class TrafficRecorder:
+    """
+    Appends one JSON line per request to a trace file
+    """
+
+    def __init__(self, path: Path):
+        """
+        Initialize the recorder
+
+        Args:
+            path: JSONL file to append to
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8', buffering=1)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def describe(route: Optional[str], path: str, args, json_body: Optional[Dict]) -> Optional[Dict]:
+        """
+        Build the anonymized, replayable description of a request
+
+        Args:
+            route: Matched route rule (None if no route matched)
+            path: Request path
+            args: Query arguments
+            json_body: Parsed JSON body, if any
+
+        Returns:
+            Trace fields, or None if the request should not be recorded
+        """
+        if path.startswith(EXCLUDED_PREFIXES):
+            return None
+
+        fields = {'route': route or 'unmatched'}
+
+        if route == '/chat':
+            body = json_body if isinstance(json_body, dict) else {}
+            history = body.get('history') or []
+            history = history if isinstance(history, list) else []
+            fields.update({
+                'language': body.get('language'),
+                'message_length': len(str(body.get('message', ''))),
+                'history_size': len(history),
+                'history_length': sum(len(str(msg.get('content', ''))) for msg in history if isinstance(msg, dict))
+            })
+        elif route == '/chat/batch':
+            body = json_body if isinstance(json_body, dict) else {}
+            items = body.get('items') if isinstance(body.get('items'), list) else []
+            items = [item for item in items if isinstance(item, dict)]
+            fields.update({
+                'item_count': len(items),
+                'languages': sorted({str(item.get('language') or 'en') for item in items}),
+                'message_length': sum(len(str(item.get('message', ''))) for item in items),
+                'history_size': sum(len(item.get('history') or []) for item in items if isinstance(item.get('history'), list))
+            })
+        elif route == '/library/search':
+            fields.update({
+                'query_length': len(args.get('q', '')),
+                'limit': args.get('limit', type=int)
+            })
+        else:
+            # Library paths and static assets are catalog data, not user input
+            fields['path'] = path
+            if route == '/library/preview/<path:filepath>':
+                fields['page'] = args.get('page', type=int)
+
+        return fields
+
+    def record(self, started: float, method: str, status: int, duration: float, fields: Dict):
+        """
+        Append one request to the trace
+
+        Args:
+            started: Wall-clock time the request arrived (seconds since the epoch)
+            method: HTTP method
+            status: Response status code
+            duration: Seconds spent handling the request
+            fields: Output of describe()
+        """
+        entry = {
+            'ts': round(started, 4),
+            'method': method,
+            'status': status,
+            'duration_ms': round(duration * 1000, 1),
+            **fields
+        }
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
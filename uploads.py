@@ -0,0 +1,356 @@
+"""
+Uploads Module
+Resumable chunked uploads of new library content
+Chunks are streamed straight to disk and verified one by one
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Optional
+
+
+class UploadError(Exception):
+    """Upload request that cannot be applied; carries the HTTP status to return"""
+
+    def __init__(self, message: str, status: int = 400, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+class UploadManager:
+    """
+    Tracks upload sessions in a staging folder next to the library, so
+    partial files are never served or indexed (same filesystem, so completed
+    files are moved into place atomically)
+
+    Protocol:
+        1. create() a session for a target path and total size
+        2. write_chunk() sequentially at the offset reported by status()
+        3. the file is moved into the library when the last byte arrives;
+           status() keeps reporting it as complete for completed_ttl seconds,
+           so a client that lost the final response can confirm success
+    """
+
+    READ_BLOCK_SIZE = 1024 * 1024
+
+    def __init__(self,
+                 library_path: Path,
+                 staging_dir: Path,
+                 max_chunk_bytes: int,
+                 session_ttl: float,
+                 completed_ttl: float = 24 * 3600,
+                 on_complete: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the upload manager
+
+        Args:
+            library_path: Path to the library folder
+            staging_dir: Folder for partial uploads (outside the library, on the same filesystem)
+            max_chunk_bytes: Largest accepted chunk
+            session_ttl: Seconds after which an idle session is discarded
+            completed_ttl: Seconds a finished upload can still be queried
+            on_complete: Called in the background with the relative path of each completed file
+        """
+        self.library_path = Path(library_path)
+        self.staging_dir = Path(staging_dir)
+        self.max_chunk_bytes = max_chunk_bytes
+        self.session_ttl = session_ttl
+        self.completed_ttl = completed_ttl
+        self.on_complete = on_complete
+
+        # Index and cache updates run off the request, one file at a time
+        self._post_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='upload-complete')
+
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+
+        # One lock per session so chunks for the same upload never interleave
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Session bookkeeping
+    # ------------------------------------------------------------------
+
+    def _lock_for(self, upload_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def _meta_path(self, upload_id: str) -> Path:
+        return self.staging_dir / f"{upload_id}.json"
+
+    def _part_path(self, upload_id: str) -> Path:
+        return self.staging_dir / f"{upload_id}.part"
+
+    def _load(self, upload_id: str) -> Dict:
+        """Load session metadata or raise a 404"""
+        if not re.fullmatch(r'[0-9a-f]{32}', upload_id):
+            raise UploadError("Upload not found", 404)
+        try:
+            return json.loads(self._meta_path(upload_id).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            raise UploadError("Upload not found", 404)
+
+    def _save(self, session: Dict):
+        """Persist session metadata atomically"""
+        meta_path = self._meta_path(session['id'])
+        tmp_path = meta_path.with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps(session), encoding='utf-8')
+        os.replace(tmp_path, meta_path)
+
+    def _discard(self, upload_id: str):
+        """Delete a session's files"""
+        for path in (self._part_path(upload_id), self._meta_path(upload_id)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        with self._locks_guard:
+            self._locks.pop(upload_id, None)
+
+    def resolve_target(self, filepath: str) -> Optional[Path]:
+        """
+        Validate the destination of an upload
+        Same traversal rules as LibraryManager.get_safe_path, but for files
+        that don't exist yet; hidden path components are rejected
+
+        Args:
+            filepath: Relative path within the library
+
+        Returns:
+            Absolute destination path, or None if it is not allowed
+        """
+        parts = Path(filepath).parts
+        if not parts or any(part.startswith('.') for part in parts):
+            return None
+
+        try:
+            library_root = self.library_path.resolve()
+            target = (self.library_path / filepath).resolve()
+            target.relative_to(library_root)
+        except (ValueError, OSError):
+            return None
+
+        if target == library_root:
+            return None
+        return target
+
+    def cleanup_stale(self) -> int:
+        """
+        Discard sessions idle for longer than the session TTL and finished
+        uploads older than the completed TTL
+
+        Returns:
+            Number of sessions removed
+        """
+        removed = 0
+        now = time.time()
+        for meta_path in self.staging_dir.glob('*.json'):
+            try:
+                age = now - meta_path.stat().st_mtime
+                if age > self.session_ttl or (
+                        age > self.completed_ttl
+                        and json.loads(meta_path.read_text(encoding='utf-8')).get('complete')):
+                    self._discard(meta_path.stem)
+                    removed += 1
+            except (OSError, ValueError):
+                continue
+        return removed
+
+    # ------------------------------------------------------------------
+    # Protocol
+    # ------------------------------------------------------------------
+
+    def create(self, filepath: str, size: int, sha256: Optional[str] = None, overwrite: bool = False) -> Dict:
+        """
+        Start an upload session
+
+        Args:
+            filepath: Destination path within the library
+            size: Total file size in bytes
+            sha256: Expected hex digest of the whole file (optional)
+            overwrite: Replace an existing file at the destination
+
+        Returns:
+            Session status
+        """
+        target = self.resolve_target(filepath)
+        if target is None:
+            raise UploadError("Invalid destination path")
+        if not isinstance(size, int) or size < 0:
+            raise UploadError("'size' must be a non-negative integer")
+        if sha256 is not None and not re.fullmatch(r'[0-9a-fA-F]{64}', str(sha256)):
+            raise UploadError("'sha256' must be a hex SHA-256 digest")
+        if target.exists() and (target.is_dir() or not overwrite):
+            raise UploadError("A file already exists at this path", 409)
+
+        self.cleanup_stale()
+
+        session = {
+            'id': uuid.uuid4().hex,
+            'path': target.relative_to(self.library_path.resolve()).as_posix(),
+            'size': size,
+            'offset': 0,
+            'sha256': sha256.lower() if sha256 else None,
+            'overwrite': overwrite,
+            'created': time.time()
+        }
+        self._part_path(session['id']).touch()
+        self._save(session)
+
+        if size == 0:
+            return self._complete(session)
+        return self._status(session)
+
+    def status(self, upload_id: str) -> Dict:
+        """
+        Get the state of an upload, e.g. to find where to resume
+
+        Args:
+            upload_id: Session ID
+
+        Returns:
+            Session status
+        """
+        return self._status(self._load(upload_id))
+
+    def write_chunk(self,
+                    upload_id: str,
+                    offset: int,
+                    stream: BinaryIO,
+                    length: int,
+                    chunk_sha256: Optional[str] = None) -> Dict:
+        """
+        Append a chunk to an upload, streaming it straight to disk
+
+        Args:
+            upload_id: Session ID
+            offset: Byte offset of the chunk (must equal the session's offset)
+            stream: Request body stream
+            length: Chunk length in bytes
+            chunk_sha256: Expected hex digest of the chunk (optional)
+
+        Returns:
+            Session status (with 'complete' and 'path' when the file is done)
+        """
+        if length <= 0:
+            raise UploadError("Chunk is empty or has no Content-Length", 411)
+        if length > self.max_chunk_bytes:
+            raise UploadError(f"Chunk exceeds {self.max_chunk_bytes} bytes", 413)
+
+        with self._lock_for(upload_id):
+            session = self._load(upload_id)
+
+            # A retried final chunk whose response was lost
+            if session.get('complete'):
+                return self._status(session)
+
+            if offset != session['offset']:
+                raise UploadError("Offset does not match the upload", 409, offset=session['offset'])
+            if offset + length > session['size']:
+                raise UploadError("Chunk extends past the declared file size", 400)
+
+            part_path = self._part_path(upload_id)
+            hasher = hashlib.sha256()
+            received = 0
+
+            with open(part_path, 'r+b') as part:
+                # Drop anything left over from an earlier interrupted chunk
+                part.truncate(offset)
+                part.seek(offset)
+
+                while received < length:
+                    block = stream.read(min(self.READ_BLOCK_SIZE, length - received))
+                    if not block:
+                        break
+                    part.write(block)
+                    hasher.update(block)
+                    received += len(block)
+
+                if received != length:
+                    part.truncate(offset)
+                    raise UploadError("Chunk was interrupted; resend it", 400, offset=offset)
+
+                if chunk_sha256 and hasher.hexdigest() != chunk_sha256.lower():
+                    part.truncate(offset)
+                    raise UploadError("Chunk checksum mismatch; resend it", 422, offset=offset)
+
+                part.flush()
+                os.fsync(part.fileno())
+
+            session['offset'] = offset + length
+            self._save(session)
+
+            if session['offset'] == session['size']:
+                return self._complete(session)
+            return self._status(session)
+
+    def abort(self, upload_id: str):
+        """
+        Cancel an upload and delete its partial data
+
+        Args:
+            upload_id: Session ID
+        """
+        self._load(upload_id)
+        with self._lock_for(upload_id):
+            self._discard(upload_id)
+
+    def _complete(self, session: Dict) -> Dict:
+        """Verify a finished upload and move it into the library"""
+        part_path = self._part_path(session['id'])
+
+        if session['sha256']:
+            hasher = hashlib.sha256()
+            with open(part_path, 'rb') as part:
+                for block in iter(lambda: part.read(self.READ_BLOCK_SIZE), b''):
+                    hasher.update(block)
+            if hasher.hexdigest() != session['sha256']:
+                self._discard(session['id'])
+                raise UploadError("File checksum mismatch; upload discarded", 422)
+
+        target = self.resolve_target(session['path'])
+        if target is None:
+            raise UploadError("Invalid destination path")
+        if target.exists() and (target.is_dir() or not session['overwrite']):
+            raise UploadError("A file already exists at this path", 409)
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(part_path, target)
+
+        # Keep a small record so status() can still confirm the upload
+        session['complete'] = True
+        session['completed'] = time.time()
+        self._save(session)
+        with self._locks_guard:
+            self._locks.pop(session['id'], None)
+
+        if self.on_complete:
+            self._post_pool.submit(self._run_on_complete, session['path'])
+
+        return self._status(session)
+
+    def _run_on_complete(self, relative_path: str):
+        """Bring the library up to date with a finished upload (background thread)"""
+        try:
+            self.on_complete(relative_path)
+        except Exception as e:
+            print(f"Error updating library after upload: {str(e)}")
+
+    @staticmethod
+    def _status(session: Dict) -> Dict:
+        """Public view of a session"""
+        return {
+            'upload_id': session['id'],
+            'path': session['path'],
+            'size': session['size'],
+            'offset': session['offset'],
+            'complete': session.get('complete', False)
+        }